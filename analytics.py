@@ -0,0 +1,169 @@
+import backup
+from db import run_script
+
+# Member vitals analytics. VITALS_ROLLUP keeps one row per member, period
+# and bucket (weeks start on Monday, months on the 1st). Inserts fold the
+# new reading into its buckets with an upsert; deletes and updates
+# recompute just the affected buckets from the (MEMB_ID, RECORD_DATE)
+# index, since min/max cannot be decremented. Readings moved to the archive
+# database stay in their buckets (see backup.archive).
+
+# BMI from weight in kg and height in cm
+BMI = '{v}.WEIGHT / (({v}.HEIGHT / 100.0) * ({v}.HEIGHT / 100.0))'
+
+# Most readings bmi_series returns, and the widest rolling window it accepts;
+# longer spans are better served by the rollups
+MAX_SERIES = 5000
+
+PERIODS = {
+    'week': ("date({d}, 'weekday 0', '-6 days')", "date({b}, '+7 days')"),
+    'month': ("date({d}, 'start of month')", "date({b}, '+1 month')"),
+}
+
+ROLLUP_TABLE = '''
+CREATE TABLE IF NOT EXISTS VITALS_ROLLUP (
+    MEMB_ID INTEGER NOT NULL,
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    readings INTEGER NOT NULL,
+    weight_n INTEGER NOT NULL,
+    weight_sum REAL,
+    weight_min REAL,
+    weight_max REAL,
+    bmi_n INTEGER NOT NULL,
+    bmi_sum REAL,
+    PRIMARY KEY (MEMB_ID, period, bucket),
+    FOREIGN KEY (MEMB_ID) REFERENCES MEMBER(MEMBER_ID) ON DELETE CASCADE
+) WITHOUT ROWID;
+'''
+
+
+def fold(period):
+    # Adds NEW to its bucket; NULL weights and heights only count as readings
+    start = PERIODS[period][0].format(d='NEW.RECORD_DATE')
+    bmi = BMI.format(v='NEW')
+    return f'''
+    INSERT INTO VITALS_ROLLUP (MEMB_ID, period, bucket, readings, weight_n, weight_sum,
+                               weight_min, weight_max, bmi_n, bmi_sum)
+        SELECT NEW.MEMB_ID, '{period}', {start}, 1, NEW.WEIGHT IS NOT NULL, NEW.WEIGHT,
+               NEW.WEIGHT, NEW.WEIGHT, {bmi} IS NOT NULL, {bmi}
+        WHERE NEW.MEMB_ID IS NOT NULL AND {start} IS NOT NULL
+        ON CONFLICT (MEMB_ID, period, bucket) DO UPDATE SET
+            readings = readings + 1,
+            weight_n = weight_n + excluded.weight_n,
+            weight_sum = COALESCE(weight_sum + excluded.weight_sum, weight_sum, excluded.weight_sum),
+            weight_min = COALESCE(min(weight_min, excluded.weight_min), weight_min, excluded.weight_min),
+            weight_max = COALESCE(max(weight_max, excluded.weight_max), weight_max, excluded.weight_max),
+            bmi_n = bmi_n + excluded.bmi_n,
+            bmi_sum = COALESCE(bmi_sum + excluded.bmi_sum, bmi_sum, excluded.bmi_sum);'''
+
+
+def recompute(period, row):
+    start, end = PERIODS[period]
+    bucket = start.format(d=f'{row}.RECORD_DATE')
+    return f'''
+    DELETE FROM VITALS_ROLLUP
+        WHERE MEMB_ID = {row}.MEMB_ID AND period = '{period}' AND bucket = {bucket};
+    INSERT INTO VITALS_ROLLUP (MEMB_ID, period, bucket, readings, weight_n, weight_sum,
+                               weight_min, weight_max, bmi_n, bmi_sum)
+        SELECT v.MEMB_ID, '{period}', {bucket}, COUNT(*), COUNT(v.WEIGHT), SUM(v.WEIGHT),
+               MIN(v.WEIGHT), MAX(v.WEIGHT), COUNT({BMI.format(v='v')}), SUM({BMI.format(v='v')})
+        FROM MEMBER_VITALS v
+        WHERE v.MEMB_ID = {row}.MEMB_ID AND {bucket} IS NOT NULL
+          AND v.RECORD_DATE >= {bucket} AND v.RECORD_DATE < {end.format(b=bucket)}
+        GROUP BY v.MEMB_ID;'''
+
+
+TRIGGERS = f'''
+CREATE TRIGGER IF NOT EXISTS vitals_rollup_insert AFTER INSERT ON MEMBER_VITALS BEGIN{fold('week')}{fold('month')}
+END;
+CREATE TRIGGER IF NOT EXISTS vitals_rollup_delete AFTER DELETE ON MEMBER_VITALS
+    WHEN {backup.NOT_ARCHIVING} BEGIN{recompute('week', 'OLD')}{recompute('month', 'OLD')}
+END;
+CREATE TRIGGER IF NOT EXISTS vitals_rollup_update AFTER UPDATE ON MEMBER_VITALS BEGIN{recompute('week', 'OLD')}{recompute('month', 'OLD')}{recompute('week', 'NEW')}{recompute('month', 'NEW')}
+END;
+'''
+
+
+# Live readings plus archived ones of current members, each counted once
+ARCHIVED_VITALS = '''(SELECT * FROM main.MEMBER_VITALS UNION ALL
+    SELECT * FROM archive.MEMBER_VITALS
+    WHERE VITALS_ID NOT IN (SELECT VITALS_ID FROM main.MEMBER_VITALS)
+      AND MEMB_ID IN (SELECT MEMBER_ID FROM main.MEMBER))'''
+
+
+def rebuild_rollups(conn):
+    conn.execute('DELETE FROM VITALS_ROLLUP')
+    vitals = ARCHIVED_VITALS if backup.has_archive(conn) else 'MEMBER_VITALS'
+    bmi = BMI.format(v='v')
+    for period, (start, _) in PERIODS.items():
+        bucket = start.format(d='v.RECORD_DATE')
+        conn.execute(f'''
+            INSERT INTO VITALS_ROLLUP (MEMB_ID, period, bucket, readings, weight_n, weight_sum,
+                                       weight_min, weight_max, bmi_n, bmi_sum)
+            SELECT v.MEMB_ID, '{period}', {bucket}, COUNT(*), COUNT(v.WEIGHT), SUM(v.WEIGHT),
+                   MIN(v.WEIGHT), MAX(v.WEIGHT), COUNT({bmi}), SUM({bmi})
+            FROM {vitals} v
+            WHERE v.MEMB_ID IS NOT NULL AND {bucket} IS NOT NULL
+            GROUP BY v.MEMB_ID, {bucket}''')
+
+
+def install(conn):
+    conn.execute(backup.ARCHIVING_TABLE)
+    run_script(conn, ROLLUP_TABLE)
+    run_script(conn, TRIGGERS)
+    rebuild_rollups(conn)
+
+
+def bmi_series(c, member_id, start=None, end=None, window=7, limit=365):
+    """Readings with BMI, rolling averages and rate of change, computed in SQL.
+
+    Rolling averages cover the last `window` readings; weight_change_per_day
+    compares each reading with the previous one. Returns at most the latest
+    `limit` readings in the range, oldest first. Only those and the `window`
+    readings before them are read, walking (MEMB_ID, RECORD_DATE) backwards,
+    so readings before `start` or the cut still feed the window.
+    """
+    limit = max(1, min(limit, MAX_SERIES))
+    window = max(1, min(window, MAX_SERIES))
+    rows = c.execute(f'''
+        SELECT * FROM (
+            SELECT VITALS_ID, RECORD_DATE, WEIGHT, HEIGHT, bmi,
+                   AVG(WEIGHT) OVER w AS weight_avg,
+                   AVG(bmi) OVER w AS bmi_avg,
+                   WEIGHT - LAG(WEIGHT) OVER o AS weight_change,
+                   (WEIGHT - LAG(WEIGHT) OVER o)
+                       / NULLIF(julianday(RECORD_DATE) - julianday(LAG(RECORD_DATE) OVER o), 0)
+                       AS weight_change_per_day
+            FROM (SELECT v.*, {BMI.format(v='v')} AS bmi FROM MEMBER_VITALS v
+                  WHERE v.MEMB_ID = ? AND (? IS NULL OR v.RECORD_DATE <= ?)
+                  ORDER BY v.RECORD_DATE DESC, v.VITALS_ID DESC LIMIT ?)
+            WINDOW o AS (ORDER BY RECORD_DATE, VITALS_ID),
+                   w AS (o ROWS BETWEEN ? PRECEDING AND CURRENT ROW)
+        )
+        WHERE ? IS NULL OR RECORD_DATE >= ?
+        ORDER BY RECORD_DATE DESC, VITALS_ID DESC
+        LIMIT ?''',
+        (member_id, end, end, limit + window, window - 1, start, start, limit)).fetchall()
+    return [{
+        'vitals_id': r[0], 'record_date': r[1], 'weight': r[2], 'height': r[3],
+        'bmi': r[4], 'weight_avg': r[5], 'bmi_avg': r[6],
+        'weight_change': r[7], 'weight_change_per_day': r[8]
+    } for r in reversed(rows)]
+
+
+def rollup_series(c, member_id, period, start=None, end=None):
+    # A range starting mid-bucket still includes that whole bucket
+    start_bucket = PERIODS[period][0].format(d='?')
+    rows = c.execute(f'''
+        SELECT bucket, readings, weight_sum / NULLIF(weight_n, 0), weight_min, weight_max,
+               bmi_sum / NULLIF(bmi_n, 0)
+        FROM VITALS_ROLLUP
+        WHERE MEMB_ID = ? AND period = ?
+          AND (? IS NULL OR bucket >= {start_bucket}) AND (? IS NULL OR bucket <= ?)
+        ORDER BY bucket''',
+        (member_id, period, start, start, end, end))
+    return [{
+        'bucket': r[0], 'readings': r[1], 'weight_avg': r[2],
+        'weight_min': r[3], 'weight_max': r[4], 'bmi_avg': r[5]
+    } for r in rows]
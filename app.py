@@ -1,351 +1,633 @@
-from flask import Flask, send_from_directory, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
-import sqlite3
 from datetime import datetime
+import gzip
+import hmac
+import json
+import sqlite3
+
+import click
 
-app = Flask(__name__, static_folder='.', static_url_path='')
+import analytics
+import assets
+import backup
+import bulk
+import cache
+import db
+import metrics
+import migrations
+import profiles
+import search
+import stats
+from db import get_db
+
+# Static files are served only through assets.py, never from the project directory
+app = Flask(__name__, static_folder=None)
+db.init_app(app)
+app.config.from_prefixed_env('FITNESS')
+cache.init_app(app)
+metrics.init_app(app)
+assets.init_app(app)
+backup.init_app(app)
 CORS(app)
 
-# Database initialization
+# Database initialization: schema changes live in migrations.py and run
+# once per deploy (`flask --app app migrate`), not on every import
 def init_db():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
-    # Create MEMBER table
-    c.execute('''CREATE TABLE IF NOT EXISTS MEMBER (
-        MEMBER_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-        NAME TEXT NOT NULL,
-        DOB TEXT,
-        JOIN_DATE TEXT,
-        EMAIL TEXT
-    )''')
-    
-    # Create MEMBER_PHONE table
-    c.execute('''CREATE TABLE IF NOT EXISTS MEMBER_PHONE (
-        MEMBER_ID INTEGER,
-        PHONE_NUMBER TEXT,
-        FOREIGN KEY (MEMBER_ID) REFERENCES MEMBER(MEMBER_ID),
-        PRIMARY KEY (MEMBER_ID, PHONE_NUMBER)
-    )''')
-    
-    # Create TRAINER table
-    c.execute('''CREATE TABLE IF NOT EXISTS TRAINER (
-        TRAINER_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-        NAME TEXT NOT NULL,
-        SPECIALISATION TEXT
-    )''')
-    
-    # Create WORKOUT_PLAN table
-    c.execute('''CREATE TABLE IF NOT EXISTS WORKOUT_PLAN (
-        Plan_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-        Plan_name TEXT,
-        Description TEXT,
-        Intensity_level TEXT,
-        Trainer_id INTEGER,
-        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID)
-    )''')
-    
-    # Create DIET_PLAN table
-    c.execute('''CREATE TABLE IF NOT EXISTS DIET_PLAN (
-        DietPlan_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        DietPlan_name TEXT,
-        Diet_Description TEXT,
-        Target_Calories INTEGER,
-        Trainer_id INTEGER,
-        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID)
-    )''')
-    
-    # Create MEMBERSHIP table
-    c.execute('''CREATE TABLE IF NOT EXISTS MEMBERSHIP (
-        Membership_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        Membership_type TEXT,
-        Start_date TEXT,
-        End_date TEXT,
-        Payment_type TEXT,
-        Payment_amount REAL,
-        Status TEXT,
-        Member_id INTEGER,
-        DietPlan_id INTEGER,
-        Trainer_id INTEGER,
-        Plan_id INTEGER,
-        FOREIGN KEY (Member_id) REFERENCES MEMBER(MEMBER_ID),
-        FOREIGN KEY (DietPlan_id) REFERENCES DIET_PLAN(DietPlan_id),
-        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID),
-        FOREIGN KEY (Plan_id) REFERENCES WORKOUT_PLAN(Plan_ID)
-    )''')
-    
-    # Create MEMBER_VITALS table
-    c.execute('''CREATE TABLE IF NOT EXISTS MEMBER_VITALS (
-        VITALS_ID INTEGER PRIMARY KEY AUTOINCREMENT,
-        WEIGHT REAL,
-        HEIGHT REAL,
-        RECORD_DATE TEXT,
-        MEMB_ID INTEGER,
-        FOREIGN KEY (MEMB_ID) REFERENCES MEMBER(MEMBER_ID)
-    )''')
-    
-    conn.commit()
+    conn = db.connect_app(app)
+    applied = migrations.migrate(conn)
     conn.close()
+    return applied
+
+@app.cli.command('migrate')
+def migrate_command():
+    applied = init_db()
+    print(f'Applied migrations: {applied}' if applied else 'Schema is up to date')
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    # Recompute the dashboard summary tables from the base tables
+    def rebuild(c):
+        stats.rebuild_stats(c)
+        cache.bump(c, 'STATS')
+    db.write(rebuild)
+    print('Dashboard statistics rebuilt')
+
+@app.cli.command('snapshot')
+@click.argument('path')
+def snapshot_command(path):
+    # Consistent copy of the live database; writers are not blocked
+    conn = db.connect_app(app)
+    try:
+        backup.snapshot(conn, path, pages=app.config['SNAPSHOT_PAGES'],
+                        sleep=app.config['SNAPSHOT_SLEEP_MS'] / 1000)
+    finally:
+        conn.close()
+    print(f'Snapshot written to {path}')
+
+@app.cli.command('export')
+@click.argument('table')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--output', '-o', help='File to write; a .gz name is gzip-compressed. Default stdout.')
+def export_command(table, fmt, output):
+    conn = db.connect_app(app)
+    try:
+        chunks = backup.export_rows(conn, table, fmt, app.config['EXPORT_CHUNK'])
+        if output is None:
+            for chunk in chunks:
+                click.echo(chunk, nl=False)
+        else:
+            opener = gzip.open if output.endswith('.gz') else open
+            with opener(output, 'wt', encoding='utf-8', newline='') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='TABLE')
+    finally:
+        conn.close()
+
+@app.cli.command('archive')
+@click.option('--vitals-before', type=click.DateTime(['%Y-%m-%d']),
+              help='Archive vitals recorded before this date')
+@click.option('--memberships-ended-before', type=click.DateTime(['%Y-%m-%d']),
+              help='Archive memberships that ended before this date')
+def archive_command(vitals_before, memberships_ended_before):
+    vitals_before = vitals_before and vitals_before.date().isoformat()
+    memberships_ended_before = memberships_ended_before and memberships_ended_before.date().isoformat()
+    if not app.config['ARCHIVE_DATABASE']:
+        raise click.UsageError('Set FITNESS_ARCHIVE_DATABASE to the archive database path')
+    conn = db.connect_app(app)
+    try:
+        moved = backup.archive(conn, app.config['ARCHIVE_DATABASE'], vitals_before,
+                               memberships_ended_before, app.config['ARCHIVE_CHUNK'])
+    finally:
+        conn.close()
+    print(f'Archived rows: {moved}' if moved else 'Nothing to archive')
+
+@app.errorhandler(db.PoolTimeout)
+def pool_timeout(e):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT_MS
+    return jsonify({'error': 'Server busy, try again shortly'}), 503, {'Retry-After': '1'}
+
+@app.errorhandler(sqlite3.IntegrityError)
+def integrity_error(e):
+    return jsonify({'error': f'Constraint violation: {e}'}), 400
+
+# List endpoints: keyset pagination, filters and streaming
+MAX_PAGE_SIZE = 1000
+
+def list_rows(sql, key, tables, filters, to_dict):
+    # filters: (query arg, SQL clause, converter) applied only when the arg is given
+    where, params = [], []
+    for arg, clause, convert in filters:
+        value = request.args.get(arg)
+        if value:
+            try:
+                params.append(convert(value))
+            except ValueError:
+                return jsonify({'error': f'Invalid value for {arg}'}), 400
+            where.append(clause)
 
-# Initialize database on startup
-init_db()
+    # Keyset pagination on the primary key: ?after=<last id>&limit=<n>.
+    # A bad value is an error rather than ignored, which would return every row
+    paging = {}
+    for arg in ('after', 'limit'):
+        value = request.args.get(arg)
+        if value is not None:
+            try:
+                paging[arg] = int(value)
+            except ValueError:
+                return jsonify({'error': f'Invalid value for {arg}'}), 400
 
-# Main route - serve index.html from project root
+    after = paging.get('after')
+    if after is not None:
+        where.append(f'{key} > ?')
+        params.append(after)
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += f' ORDER BY {key}'
+
+    limit = paging.get('limit')
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        sql += ' LIMIT ?'
+        params.append(limit)
+
+    stream = request.args.get('stream')
+    if stream in ('json', 'ndjson'):
+        return stream_rows(sql, params, to_dict, stream)
+
+    def build():
+        c = get_db().cursor()
+        c.execute(sql, params)
+        rows = c.fetchall()
+        response = jsonify([to_dict(r) for r in rows])
+        # A full page means there may be more; the client passes this back as ?after=
+        if limit is not None and len(rows) == limit:
+            response.headers['X-Next-After'] = str(rows[-1][0])
+        return response
+
+    return cache.cached_response(tables, build)
+
+def stream_rows(sql, params, to_dict, fmt):
+    # The generator outlives the app context and may run for as long as the
+    # client reads, so it opens its own connection instead of holding a pooled one
+    def generate():
+        conn = db.connect_app(app)
+        try:
+            c = conn.cursor().execute(sql, params)
+            if fmt == 'ndjson':
+                for row in c:
+                    yield json.dumps(to_dict(row)) + '\n'
+            else:
+                yield '['
+                separator = ''
+                for row in c:
+                    yield separator + json.dumps(to_dict(row))
+                    separator = ','
+                yield ']'
+        finally:
+            conn.close()
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    return Response(generate(), mimetype=mimetype)
+
+def archived_source(table):
+    # ?archived=true lists the rows `flask archive` moved out of the table
+    if request.args.get('archived') not in ('1', 'true'):
+        return table
+    if not app.config['ARCHIVE_DATABASE']:
+        return None
+    return f'archive.{table}'
+
+NO_ARCHIVE = {'error': 'No archive database is configured'}
+
+def like_prefix(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+# Deletes shared by the single-row and batch DELETE handlers; ids are
+# passed as one JSON array so a whole batch is removed in a single pass.
+# Related rows are handled by the ON DELETE actions from migrations.py:
+# member deletes cascade to phones, memberships and vitals, trainer and
+# plan deletes set the references to them to NULL.
+IN_IDS = 'IN (SELECT value FROM json_each(?))'
+
+def remove_members(c, ids):
+    ids_json = json.dumps(ids)
+    if backup.has_archive(c.connection):
+        # The archive has no foreign keys, so the members' archived rows are
+        # deleted here, and their memberships leave the dashboard stats the
+        # way the cascade takes out the live ones
+        stats.forget_memberships(c, f'''SELECT * FROM archive.MEMBERSHIP WHERE Member_id {IN_IDS}
+            AND Membership_id NOT IN (SELECT Membership_id FROM main.MEMBERSHIP)''', (ids_json,))
+        c.execute(f'DELETE FROM archive.MEMBERSHIP WHERE Member_id {IN_IDS}', (ids_json,))
+        c.execute(f'DELETE FROM archive.MEMBER_VITALS WHERE MEMB_ID {IN_IDS}', (ids_json,))
+    return c.execute(f'DELETE FROM MEMBER WHERE MEMBER_ID {IN_IDS}', (ids_json,)).rowcount
+
+def remove_trainers(c, ids):
+    return c.execute(f'DELETE FROM TRAINER WHERE TRAINER_ID {IN_IDS}', (json.dumps(ids),)).rowcount
+
+def remove_memberships(c, ids):
+    return c.execute(f'DELETE FROM MEMBERSHIP WHERE Membership_id {IN_IDS}', (json.dumps(ids),)).rowcount
+
+def remove_workouts(c, ids):
+    return c.execute(f'DELETE FROM WORKOUT_PLAN WHERE Plan_ID {IN_IDS}', (json.dumps(ids),)).rowcount
+
+def remove_diets(c, ids):
+    return c.execute(f'DELETE FROM DIET_PLAN WHERE DietPlan_id {IN_IDS}', (json.dumps(ids),)).rowcount
+
+def remove_vitals(c, ids):
+    return c.execute(f'DELETE FROM MEMBER_VITALS WHERE VITALS_ID {IN_IDS}', (json.dumps(ids),)).rowcount
+
+# All writes go through db.write(), which commits on the request's pooled
+# connection or hands the operation to the group-commit writer thread when
+# DB_WRITE_QUEUE is set. Triggers bump TABLE_VERSION for every changed
+# table, including rows changed by ON DELETE actions, which invalidates
+# the cached responses built from them.
+
+# Main route - index.html with fingerprinted asset references
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return assets.index_response()
 
 # MEMBER CRUD Operations
 @app.route('/api/members', methods=['GET', 'POST'])
 def members():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES (?, ?, ?, ?)',
-                  (data['name'], data['dob'], data['join_date'], data['email']))
-        conn.commit()
-        member_id = c.lastrowid
-        conn.close()
+        member_id = db.write(lambda c: c.execute(
+            'INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES (?, ?, ?, ?)',
+            (data['name'], data['dob'], data['join_date'], data['email'])).lastrowid)
         return jsonify({'message': 'Member added successfully', 'member_id': member_id}), 201
     
     else:
-        c.execute('SELECT * FROM MEMBER')
-        members = c.fetchall()
-        conn.close()
-        return jsonify([{
+        return list_rows('SELECT * FROM MEMBER', 'MEMBER_ID', ['MEMBER'], [
+            ('name', "NAME LIKE ? ESCAPE '\\'", like_prefix),
+            ('email', 'EMAIL = ?', str),
+            ('joined_from', 'JOIN_DATE >= ?', str),
+            ('joined_to', 'JOIN_DATE <= ?', str),
+        ], lambda m: {
             'member_id': m[0], 'name': m[1], 'dob': m[2], 
             'join_date': m[3], 'email': m[4]
-        } for m in members])
+        })
+
+# Tables a member profile is assembled from
+PROFILE_TABLES = ['MEMBER', 'MEMBER_PHONE', 'MEMBERSHIP', 'MEMBER_VITALS',
+                  'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN']
+
+@app.route('/api/members/profiles', methods=['GET'])
+def member_profiles():
+    # ?ids=1,2,3 returns a page of profiles in one round trip
+    try:
+        ids = [int(i) for i in request.args.get('ids', '').split(',') if i]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma-separated list of integers'}), 400
+    if len(ids) > profiles.MAX_IDS:
+        return jsonify({'error': f'At most {profiles.MAX_IDS} ids per request'}), 400
+    vitals_limit = request.args.get('vitals', 10, type=int)
+    if vitals_limit < 0:
+        return jsonify({'error': 'vitals must not be negative'}), 400
+    return cache.cached_response(PROFILE_TABLES, lambda: jsonify(
+        profiles.load_profiles(get_db().cursor(), ids, vitals_limit) if ids else []))
 
-@app.route('/api/members/<int:id>', methods=['PUT', 'DELETE'])
+@app.route('/api/members/<int:id>', methods=['GET', 'PUT', 'DELETE'])
 def member_detail(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
-    if request.method == 'PUT':
+    if request.method == 'GET':
+        # ?vitals= how many of the latest readings to include
+        limit = request.args.get('vitals', 10, type=int)
+        if limit < 0:
+            return jsonify({'error': 'vitals must not be negative'}), 400
+        def build():
+            found = profiles.load_profiles(get_db().cursor(), [id], limit)
+            if not found:
+                return jsonify({'error': 'Member not found'}), 404
+            return jsonify(found[0])
+        return cache.cached_response(PROFILE_TABLES, build)
+
+    elif request.method == 'PUT':
         data = request.json
-        c.execute('UPDATE MEMBER SET NAME=?, DOB=?, EMAIL=? WHERE MEMBER_ID=?',
-                  (data['name'], data['dob'], data['email'], id))
-        conn.commit()
-        conn.close()
+        db.write(lambda c: c.execute(
+            'UPDATE MEMBER SET NAME=?, DOB=?, EMAIL=? WHERE MEMBER_ID=?',
+            (data['name'], data['dob'], data['email'], id)))
         return jsonify({'message': 'Member updated successfully'})
     
     elif request.method == 'DELETE':
-        # Cascading delete: Remove all related records first
-        c.execute('DELETE FROM MEMBER_VITALS WHERE MEMB_ID=?', (id,))
-        c.execute('DELETE FROM MEMBERSHIP WHERE Member_id=?', (id,))
-        c.execute('DELETE FROM MEMBER_PHONE WHERE MEMBER_ID=?', (id,))
-        c.execute('DELETE FROM MEMBER WHERE MEMBER_ID=?', (id,))
-        conn.commit()
-        conn.close()
+        db.write(lambda c: remove_members(c, [id]))
         return jsonify({'message': 'Member and all related records deleted successfully'})
 
 # TRAINER CRUD Operations
 @app.route('/api/trainers', methods=['GET', 'POST'])
 def trainers():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES (?, ?)',
-                  (data['name'], data['specialisation']))
-        conn.commit()
-        trainer_id = c.lastrowid
-        conn.close()
+        trainer_id = db.write(lambda c: c.execute(
+            'INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES (?, ?)',
+            (data['name'], data['specialisation'])).lastrowid)
         return jsonify({'message': 'Trainer added successfully', 'trainer_id': trainer_id}), 201
     
     else:
-        c.execute('SELECT * FROM TRAINER')
-        trainers = c.fetchall()
-        conn.close()
-        return jsonify([{
+        return list_rows('SELECT * FROM TRAINER', 'TRAINER_ID', ['TRAINER'], [
+            ('name', "NAME LIKE ? ESCAPE '\\'", like_prefix),
+            ('specialisation', 'SPECIALISATION = ?', str),
+        ], lambda t: {
             'trainer_id': t[0], 'name': t[1], 'specialisation': t[2]
-        } for t in trainers])
+        })
 
 @app.route('/api/trainers/<int:id>', methods=['PUT', 'DELETE'])
 def trainer_detail(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'PUT':
         data = request.json
-        c.execute('UPDATE TRAINER SET NAME=?, SPECIALISATION=? WHERE TRAINER_ID=?',
-                  (data['name'], data['specialisation'], id))
-        conn.commit()
-        conn.close()
+        db.write(lambda c: c.execute(
+            'UPDATE TRAINER SET NAME=?, SPECIALISATION=? WHERE TRAINER_ID=?',
+            (data['name'], data['specialisation'], id)))
         return jsonify({'message': 'Trainer updated successfully'})
     
     elif request.method == 'DELETE':
-        # Cascading delete: Remove all related records first
-        # Set trainer_id to NULL in related tables instead of deleting the records
-        c.execute('UPDATE MEMBERSHIP SET Trainer_id=NULL WHERE Trainer_id=?', (id,))
-        c.execute('UPDATE WORKOUT_PLAN SET Trainer_id=NULL WHERE Trainer_id=?', (id,))
-        c.execute('UPDATE DIET_PLAN SET Trainer_id=NULL WHERE Trainer_id=?', (id,))
-        c.execute('DELETE FROM TRAINER WHERE TRAINER_ID=?', (id,))
-        conn.commit()
-        conn.close()
+        db.write(lambda c: remove_trainers(c, [id]))
         return jsonify({'message': 'Trainer deleted successfully and references updated'})
 
 # MEMBERSHIP CRUD Operations
 @app.route('/api/memberships', methods=['GET', 'POST'])
 def memberships():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('''INSERT INTO MEMBERSHIP 
-                     (Membership_type, Start_date, End_date, Payment_type, 
-                      Payment_amount, Status, Member_id, DietPlan_id, Trainer_id, Plan_id) 
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                  (data['membership_type'], data['start_date'], data['end_date'],
-                   data['payment_type'], data['payment_amount'], data['status'],
-                   data['member_id'], data.get('dietplan_id'), data.get('trainer_id'), data.get('plan_id')))
-        conn.commit()
-        membership_id = c.lastrowid
-        conn.close()
+        membership_id = db.write(lambda c: c.execute(
+            '''INSERT INTO MEMBERSHIP 
+               (Membership_type, Start_date, End_date, Payment_type, 
+                Payment_amount, Status, Member_id, DietPlan_id, Trainer_id, Plan_id) 
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+            (data['membership_type'], data['start_date'], data['end_date'],
+             data['payment_type'], data['payment_amount'], data['status'],
+             data['member_id'], data.get('dietplan_id'), data.get('trainer_id'), data.get('plan_id'))).lastrowid)
         return jsonify({'message': 'Membership added successfully', 'membership_id': membership_id}), 201
     
     else:
-        c.execute('''SELECT m.*, mem.NAME 
-                     FROM MEMBERSHIP m 
-                     LEFT JOIN MEMBER mem ON m.Member_id = mem.MEMBER_ID''')
-        memberships = c.fetchall()
-        conn.close()
-        return jsonify([{
+        source = archived_source('MEMBERSHIP')
+        if source is None:
+            return jsonify(NO_ARCHIVE), 400
+        return list_rows(f'''SELECT m.*, mem.NAME 
+                             FROM {source} m 
+                             LEFT JOIN MEMBER mem ON m.Member_id = mem.MEMBER_ID''', 'm.Membership_id', [source, 'MEMBER'], [
+            ('status', 'm.Status = ?', str),
+            ('membership_type', 'm.Membership_type = ?', str),
+            ('member_id', 'm.Member_id = ?', int),
+            ('trainer_id', 'm.Trainer_id = ?', int),
+            ('ends_after', 'm.End_date >= ?', str),
+            ('ends_before', 'm.End_date <= ?', str),
+        ], lambda m: {
             'membership_id': m[0], 'membership_type': m[1], 'start_date': m[2],
             'end_date': m[3], 'payment_type': m[4], 'payment_amount': m[5],
             'status': m[6], 'member_id': m[7], 'member_name': m[11]
-        } for m in memberships])
+        })
 
 @app.route('/api/memberships/<int:id>', methods=['DELETE'])
 def delete_membership(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    c.execute('DELETE FROM MEMBERSHIP WHERE Membership_id=?', (id,))
-    conn.commit()
-    conn.close()
+    db.write(lambda c: remove_memberships(c, [id]))
     return jsonify({'message': 'Membership deleted successfully'})
 
 # WORKOUT PLAN CRUD Operations
 @app.route('/api/workouts', methods=['GET', 'POST'])
 def workouts():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('''INSERT INTO WORKOUT_PLAN 
-                     (Plan_name, Description, Intensity_level, Trainer_id) 
-                     VALUES (?, ?, ?, ?)''',
-                  (data['plan_name'], data['description'], 
-                   data['intensity_level'], data.get('trainer_id')))
-        conn.commit()
-        plan_id = c.lastrowid
-        conn.close()
+        plan_id = db.write(lambda c: c.execute(
+            '''INSERT INTO WORKOUT_PLAN 
+               (Plan_name, Description, Intensity_level, Trainer_id) 
+               VALUES (?, ?, ?, ?)''',
+            (data['plan_name'], data['description'], 
+             data['intensity_level'], data.get('trainer_id'))).lastrowid)
         return jsonify({'message': 'Workout plan added successfully', 'plan_id': plan_id}), 201
     
     else:
-        c.execute('''SELECT w.*, t.NAME 
-                     FROM WORKOUT_PLAN w 
-                     LEFT JOIN TRAINER t ON w.Trainer_id = t.TRAINER_ID''')
-        workouts = c.fetchall()
-        conn.close()
-        return jsonify([{
+        return list_rows('''SELECT w.*, t.NAME 
+                            FROM WORKOUT_PLAN w 
+                            LEFT JOIN TRAINER t ON w.Trainer_id = t.TRAINER_ID''', 'w.Plan_ID', ['WORKOUT_PLAN', 'TRAINER'], [
+            ('trainer_id', 'w.Trainer_id = ?', int),
+            ('intensity_level', 'w.Intensity_level = ?', str),
+        ], lambda w: {
             'plan_id': w[0], 'plan_name': w[1], 'description': w[2],
             'intensity_level': w[3], 'trainer_id': w[4], 'trainer_name': w[5]
-        } for w in workouts])
+        })
 
 @app.route('/api/workouts/<int:id>', methods=['DELETE'])
 def delete_workout(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    # First remove references in MEMBERSHIP table
-    c.execute('UPDATE MEMBERSHIP SET Plan_id=NULL WHERE Plan_id=?', (id,))
-    c.execute('DELETE FROM WORKOUT_PLAN WHERE Plan_ID=?', (id,))
-    conn.commit()
-    conn.close()
+    db.write(lambda c: remove_workouts(c, [id]))
     return jsonify({'message': 'Workout plan deleted successfully'})
 
 # DIET PLAN CRUD Operations
 @app.route('/api/diets', methods=['GET', 'POST'])
 def diets():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('''INSERT INTO DIET_PLAN 
-                     (DietPlan_name, Diet_Description, Target_Calories, Trainer_id) 
-                     VALUES (?, ?, ?, ?)''',
-                  (data['dietplan_name'], data['diet_description'], 
-                   data['target_calories'], data.get('trainer_id')))
-        conn.commit()
-        dietplan_id = c.lastrowid
-        conn.close()
+        dietplan_id = db.write(lambda c: c.execute(
+            '''INSERT INTO DIET_PLAN 
+               (DietPlan_name, Diet_Description, Target_Calories, Trainer_id) 
+               VALUES (?, ?, ?, ?)''',
+            (data['dietplan_name'], data['diet_description'], 
+             data['target_calories'], data.get('trainer_id'))).lastrowid)
         return jsonify({'message': 'Diet plan added successfully', 'dietplan_id': dietplan_id}), 201
     
     else:
-        c.execute('''SELECT d.*, t.NAME 
-                     FROM DIET_PLAN d 
-                     LEFT JOIN TRAINER t ON d.Trainer_id = t.TRAINER_ID''')
-        diets = c.fetchall()
-        conn.close()
-        return jsonify([{
+        return list_rows('''SELECT d.*, t.NAME 
+                            FROM DIET_PLAN d 
+                            LEFT JOIN TRAINER t ON d.Trainer_id = t.TRAINER_ID''', 'd.DietPlan_id', ['DIET_PLAN', 'TRAINER'], [
+            ('trainer_id', 'd.Trainer_id = ?', int),
+            ('max_calories', 'd.Target_Calories <= ?', int),
+        ], lambda d: {
             'dietplan_id': d[0], 'dietplan_name': d[1], 'diet_description': d[2],
             'target_calories': d[3], 'trainer_id': d[4], 'trainer_name': d[5]
-        } for d in diets])
+        })
 
 @app.route('/api/diets/<int:id>', methods=['DELETE'])
 def delete_diet(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    # First remove references in MEMBERSHIP table
-    c.execute('UPDATE MEMBERSHIP SET DietPlan_id=NULL WHERE DietPlan_id=?', (id,))
-    c.execute('DELETE FROM DIET_PLAN WHERE DietPlan_id=?', (id,))
-    conn.commit()
-    conn.close()
+    db.write(lambda c: remove_diets(c, [id]))
     return jsonify({'message': 'Diet plan deleted successfully'})
 
 # MEMBER VITALS Operations
 @app.route('/api/vitals', methods=['GET', 'POST'])
 def vitals():
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    
     if request.method == 'POST':
         data = request.json
-        c.execute('''INSERT INTO MEMBER_VITALS 
-                     (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) 
-                     VALUES (?, ?, ?, ?)''',
-                  (data['weight'], data['height'], data['record_date'], data['memb_id']))
-        conn.commit()
-        vitals_id = c.lastrowid
-        conn.close()
+        vitals_id = db.write(lambda c: c.execute(
+            '''INSERT INTO MEMBER_VITALS 
+               (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) 
+               VALUES (?, ?, ?, ?)''',
+            (data['weight'], data['height'], data['record_date'], data['memb_id'])).lastrowid)
         return jsonify({'message': 'Vitals recorded successfully', 'vitals_id': vitals_id}), 201
     
     else:
-        c.execute('''SELECT v.*, m.NAME 
-                     FROM MEMBER_VITALS v 
-                     LEFT JOIN MEMBER m ON v.MEMB_ID = m.MEMBER_ID''')
-        vitals = c.fetchall()
-        conn.close()
-        return jsonify([{
+        source = archived_source('MEMBER_VITALS')
+        if source is None:
+            return jsonify(NO_ARCHIVE), 400
+        return list_rows(f'''SELECT v.*, m.NAME 
+                             FROM {source} v 
+                             LEFT JOIN MEMBER m ON v.MEMB_ID = m.MEMBER_ID''', 'v.VITALS_ID', [source, 'MEMBER'], [
+            ('memb_id', 'v.MEMB_ID = ?', int),
+            ('from', 'v.RECORD_DATE >= ?', str),
+            ('to', 'v.RECORD_DATE <= ?', str),
+        ], lambda v: {
             'vitals_id': v[0], 'weight': v[1], 'height': v[2],
             'record_date': v[3], 'memb_id': v[4], 'member_name': v[5]
-        } for v in vitals])
+        })
 
 @app.route('/api/vitals/<int:id>', methods=['DELETE'])
 def delete_vitals(id):
-    conn = sqlite3.connect('database.db')
-    c = conn.cursor()
-    c.execute('DELETE FROM MEMBER_VITALS WHERE VITALS_ID=?', (id,))
-    conn.commit()
-    conn.close()
+    db.write(lambda c: remove_vitals(c, [id]))
     return jsonify({'message': 'Vitals record deleted successfully'})
 
+# DASHBOARD Statistics: read from the trigger-maintained summary tables
+@app.route('/api/stats', methods=['GET'])
+def dashboard_stats():
+    return cache.cached_response(
+        ['MEMBER', 'TRAINER', 'MEMBERSHIP', 'WORKOUT_PLAN', 'DIET_PLAN', 'STATS'],
+        lambda: jsonify(stats.read_stats(get_db().cursor())))
+
+# MEMBER VITALS Analytics
+@app.route('/api/members/<int:id>/vitals/series', methods=['GET'])
+def vitals_series(id):
+    # ?from=&to= date range, ?window= readings in the rolling averages,
+    # ?limit= most recent readings returned (default 365)
+    start, end = request.args.get('from'), request.args.get('to')
+    window = request.args.get('window', 7, type=int)
+    limit = max(1, min(request.args.get('limit', 365, type=int), analytics.MAX_SERIES))
+
+    def build():
+        series = analytics.bmi_series(get_db().cursor(), id, start, end, window, limit)
+        response = jsonify(series)
+        # A full series may have been cut; weekly or monthly rollups cover long spans
+        if len(series) == limit:
+            response.headers['X-Truncated'] = 'true'
+            response.headers['Link'] = f'</api/members/{id}/vitals/rollup>; rel="alternate"'
+        return response
+
+    return cache.cached_response(['MEMBER_VITALS'], build)
+
+@app.route('/api/members/<int:id>/vitals/rollup', methods=['GET'])
+def vitals_rollup(id):
+    period = request.args.get('period', 'week')
+    if period not in analytics.PERIODS:
+        return jsonify({'error': f'period must be one of {", ".join(analytics.PERIODS)}'}), 400
+    return cache.cached_response(['MEMBER_VITALS'], lambda: jsonify(analytics.rollup_series(
+        get_db().cursor(), id, period, request.args.get('from'), request.args.get('to'))))
+
+# SEARCH across members, trainers and plans
+@app.route('/api/search', methods=['GET'])
+def search_all():
+    # ?q= words to match (last one as a prefix), ?type= comma-separated
+    # subset of members,trainers,workouts,diets, ?limit= and ?offset=
+    text = request.args.get('q', '')
+    kinds = [k for k in request.args.get('type', '').split(',') if k] or None
+    if kinds and any(k not in search.INDEXES for k in kinds):
+        return jsonify({'error': f'type must be among {", ".join(search.INDEXES)}'}), 400
+    if search.match_query(text) is None:
+        return jsonify({'error': 'Missing search text'}), 400
+    limit = max(1, request.args.get('limit', 20, type=int))
+    offset = max(0, request.args.get('offset', 0, type=int))
+    return cache.cached_response(
+        ['MEMBER', 'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN'],
+        lambda: jsonify(search.search(get_db().cursor(), text, kinds, limit, offset)))
+
+# BATCH Operations
+BATCH_DELETES = {
+    'members': remove_members,
+    'trainers': remove_trainers,
+    'memberships': remove_memberships,
+    'workouts': remove_workouts,
+    'diets': remove_diets,
+    'vitals': remove_vitals,
+}
+
+@app.route('/api/<resource>/batch', methods=['POST', 'DELETE'])
+def batch(resource):
+    if resource not in bulk.RESOURCES:
+        return jsonify({'error': f'Unknown resource: {resource}'}), 404
+
+    if request.method == 'POST':
+        # Body: JSON array, NDJSON (application/x-ndjson) or CSV (text/csv).
+        # Rows are read and validated first so the write lock is only held
+        # for the inserts themselves.
+        try:
+            results, pending = bulk.prepare(resource, bulk.read_rows(request))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        inserted = db.write(lambda c: bulk.insert_rows(c, resource, pending, results)) if pending else 0
+        failed = len(results) - inserted
+        return jsonify({
+            'message': f'{inserted} rows added, {failed} rejected',
+            'inserted': inserted, 'failed': failed, 'results': results
+        }), 207 if failed else 201
+
+    else:
+        ids = (request.get_json(silent=True) or {}).get('ids')
+        if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+            return jsonify({'error': 'Expected {"ids": [<int>, ...]}'}), 400
+        deleted = db.write(lambda c: BATCH_DELETES[resource](c, ids))
+        return jsonify({'message': f'{deleted} records deleted successfully', 'deleted': deleted})
+
+# ADMIN Export and archive, enabled by setting ADMIN_TOKEN
+def admin_denied():
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        return jsonify({'error': 'Admin endpoints are disabled'}), 404
+    supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    # FITNESS_* values are parsed as JSON, so an all-digit token arrives as an int
+    if not hmac.compare_digest(supplied.encode(), str(token).encode()):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    return None
+
+@app.route('/api/admin/export/<table>', methods=['GET'])
+def admin_export(table):
+    # ?format=ndjson|csv; archived tables are named archive.MEMBERSHIP etc.
+    denied = admin_denied()
+    if denied:
+        return denied
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    if table not in backup.exportable(get_db()):
+        return jsonify({'error': f'Unknown table: {table}'}), 404
+
+    # Exports can run for minutes, so they open their own connection
+    # instead of holding one of the request pool's
+    chunk_size = app.config['EXPORT_CHUNK']
+
+    def generate():
+        conn = db.connect_app(app)
+        try:
+            yield from backup.export_rows(conn, table, fmt, chunk_size)
+        finally:
+            conn.close()
+
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={table}.{fmt}'})
+
+@app.route('/api/admin/archive', methods=['POST'])
+def admin_archive():
+    # Body: {"vitals_before": "YYYY-MM-DD", "memberships_ended_before": "YYYY-MM-DD"}
+    denied = admin_denied()
+    if denied:
+        return denied
+    if not app.config['ARCHIVE_DATABASE']:
+        return jsonify(NO_ARCHIVE), 400
+    data = request.get_json(silent=True) or {}
+    cutoffs = {}
+    for field in ('vitals_before', 'memberships_ended_before'):
+        value = data.get(field)
+        if value is not None:
+            try:
+                cutoffs[field] = datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+            except (TypeError, ValueError):
+                return jsonify({'error': f'{field} must be a YYYY-MM-DD date'}), 400
+    # Runs on its own connection in short chunked transactions
+    conn = db.connect_app(app)
+    try:
+        moved = backup.archive(conn, app.config['ARCHIVE_DATABASE'], chunk_size=app.config['ARCHIVE_CHUNK'],
+                               **cutoffs)
+    finally:
+        conn.close()
+    return jsonify({'message': 'Archive complete', 'archived': moved})
+
 if __name__ == '__main__':
+    init_db()
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, abort, current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULTS = {
+    'STATIC_DIR': None,          # defaults to static/ next to app.py
+    'ASSETS_PREFIX': '/assets',
+}
+
+# Hashed names never change content, so clients keep them for a year
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Text types worth compressing; images and fonts are already compressed
+COMPRESSIBLE = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+REFERENCE = re.compile(r'''(\b(?:href|src)=["'])([^"'#?:]+)(["'])''')
+
+
+class Asset:
+    """One file held in memory with its precompressed variants."""
+
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.variants = {'identity': body}
+        if mimetype.startswith(COMPRESSIBLE):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.variants['br'] = compressed
+
+
+class Manifest:
+    """Fingerprinted copies of every file in the static directory.
+
+    Assets are built once at startup: each file is served under
+    name.<hash>.ext, and index.html has its references rewritten to those
+    names, so only index.html itself needs revalidating on a repeat visit.
+    """
+
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.build()
+
+    def build(self):
+        assets, names, mtimes = {}, {}, {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                if name == 'index.html':
+                    continue
+                with open(path, 'rb') as f:
+                    body = f.read()
+                mtimes[path] = os.path.getmtime(path)
+                asset = Asset(body, mimetypes.guess_type(name)[0] or 'application/octet-stream')
+                stem, ext = os.path.splitext(name)
+                hashed = f'{stem}.{asset.digest[:12]}{ext}'
+                assets[hashed] = asset
+                names[name] = hashed
+
+        index_path = os.path.join(self.directory, 'index.html')
+        with open(index_path, encoding='utf-8') as f:
+            html = f.read()
+        mtimes[index_path] = os.path.getmtime(index_path)
+        # Assets referenced by the page point at their fingerprinted names
+        html = REFERENCE.sub(
+            lambda m: m.group(1) + (f'{self.prefix}/{names[m.group(2)]}' if m.group(2) in names
+                                    else m.group(2)) + m.group(3), html)
+        index = Asset(html.encode('utf-8'), 'text/html')
+
+        with self.lock:
+            self.assets, self.names, self.index, self.mtimes = assets, names, index, mtimes
+
+    def stale(self):
+        try:
+            return any(os.path.getmtime(p) != t for p, t in self.mtimes.items())
+        except OSError:
+            return True
+
+
+def choose_encoding(asset):
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and accepted[encoding]:
+            return encoding
+    return 'identity'
+
+
+def serve(asset, cache_control):
+    encoding = choose_encoding(asset)
+    response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(f'{asset.digest}-{encoding}')
+    return response.make_conditional(request)
+
+
+def get_manifest():
+    manifest = current_app.extensions['fitness_assets']
+    # While developing, pick up edited files without a restart
+    if current_app.debug and manifest.stale():
+        manifest.build()
+    return manifest
+
+
+def index_response():
+    # Revalidated on every visit; a match costs a 304
+    return serve(get_manifest().index, 'no-cache')
+
+
+def asset_view(name):
+    asset = get_manifest().assets.get(name)
+    if asset is None:
+        abort(404)
+    return serve(asset, IMMUTABLE)
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    directory = app.config['STATIC_DIR'] or os.path.join(app.root_path, 'static')
+    prefix = app.config['ASSETS_PREFIX'].rstrip('/')
+    app.extensions['fitness_assets'] = Manifest(directory, prefix)
+    app.add_url_rule(f'{prefix}/<path:name>', 'asset', asset_view)
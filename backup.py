@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import os
+import sqlite3
+
+# Admin snapshot, export and archive. Snapshots copy the live database with
+# SQLite's online backup API while writers keep committing, exports stream
+# one table in chunks, and archiving moves old MEMBER_VITALS readings and
+# ended memberships into a separate database attached as `archive`, where
+# they can still be listed (?archived=true) and exported.
+
+DEFAULTS = {
+    'ADMIN_TOKEN': None,          # bearer token for /api/admin/*; unset disables those routes
+    'SNAPSHOT_PAGES': 256,        # pages copied per backup step
+    'SNAPSHOT_SLEEP_MS': 5,       # pause before retrying a step that found the database busy or locked
+    'EXPORT_CHUNK': 1000,         # rows read per query when exporting
+    'ARCHIVE_CHUNK': 5000,        # rows moved per transaction when archiving
+}
+
+EXPORT_TABLES = ('MEMBER', 'MEMBER_PHONE', 'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN',
+                 'MEMBERSHIP', 'MEMBER_VITALS')
+
+# Archived tables keep the source columns and ids; there are no foreign keys
+# since SQLite cannot reference tables in another database
+ARCHIVE_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS archive.MEMBERSHIP (
+        Membership_id INTEGER PRIMARY KEY,
+        Membership_type TEXT,
+        Start_date TEXT,
+        End_date TEXT,
+        Payment_type TEXT,
+        Payment_amount REAL,
+        Status TEXT,
+        Member_id INTEGER,
+        DietPlan_id INTEGER,
+        Trainer_id INTEGER,
+        Plan_id INTEGER
+    )''',
+    '''CREATE TABLE IF NOT EXISTS archive.MEMBER_VITALS (
+        VITALS_ID INTEGER PRIMARY KEY,
+        WEIGHT REAL,
+        HEIGHT REAL,
+        RECORD_DATE TEXT,
+        MEMB_ID INTEGER
+    )''',
+    'CREATE INDEX IF NOT EXISTS archive.idx_membership_member ON MEMBERSHIP (Member_id)',
+    'CREATE INDEX IF NOT EXISTS archive.idx_vitals_member_date ON MEMBER_VITALS (MEMB_ID, RECORD_DATE)',
+)
+
+# archive() holds a row here while it deletes the rows it has copied, inside
+# its own transaction. The summary and rollup delete triggers skip deletes
+# made while it is set, so archived rows keep counting in the dashboard
+# stats and vitals rollups.
+ARCHIVING_TABLE = 'CREATE TABLE IF NOT EXISTS ARCHIVING (active INTEGER)'
+NOT_ARCHIVING = 'NOT EXISTS (SELECT 1 FROM ARCHIVING)'
+
+# table: (id column, condition on the cutoff date)
+ARCHIVE_RULES = {
+    'MEMBER_VITALS': ('VITALS_ID', 'RECORD_DATE < ?'),
+    'MEMBERSHIP': ('Membership_id', 'End_date < ?'),
+}
+
+
+def has_archive(conn):
+    return any(r[1] == 'archive' for r in conn.execute('PRAGMA database_list'))
+
+
+def attach_archive(conn, path):
+    """Attach the archive database as `archive`, creating its tables once."""
+    if has_archive(conn):
+        return
+    conn.execute('ATTACH DATABASE ? AS archive', (path,))
+    conn.execute('PRAGMA archive.journal_mode=WAL')
+    if conn.execute("SELECT COUNT(*) FROM archive.sqlite_master WHERE type = 'table'").fetchone()[0] < 2:
+        for statement in ARCHIVE_SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+
+def snapshot(conn, path, pages=DEFAULTS['SNAPSHOT_PAGES'],
+             sleep=DEFAULTS['SNAPSHOT_SLEEP_MS'] / 1000, progress=None):
+    """Copy the main database to `path` without blocking writers.
+
+    A read transaction held on `conn` pins one version of the database for
+    every backup step, so the copy is consistent even though writers keep
+    committing to the WAL in between steps. The file only appears at
+    `path` once complete.
+    """
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    target = sqlite3.connect(partial)
+    try:
+        conn.execute('BEGIN')
+        conn.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+        try:
+            conn.backup(target, pages=pages, progress=progress, sleep=sleep)
+        finally:
+            conn.rollback()
+        # A standalone file, not one that expects a -wal next to it
+        target.execute('PRAGMA journal_mode=DELETE')
+    finally:
+        target.close()
+    os.replace(partial, path)
+
+
+def exportable(conn):
+    tables = list(EXPORT_TABLES)
+    if has_archive(conn):
+        tables += [f'archive.{t}' for t in ARCHIVE_RULES]
+    return tables
+
+
+def export_rows(conn, table, fmt='ndjson', chunk_size=DEFAULTS['EXPORT_CHUNK']):
+    """Yield one table as CSV or NDJSON text, reading `chunk_size` rows at a time.
+
+    Chunks are read by rowid and each is its own query, so a long export
+    never holds a read transaction open and checkpoints keep running.
+    """
+    if table not in exportable(conn):
+        raise ValueError(f'Unknown table: {table}')
+    schema, _, name = table.rpartition('.')
+    schema = schema or 'main'
+    columns = [r[1] for r in conn.execute(f'PRAGMA {schema}.table_info({name})')]
+    sql = f'''SELECT rowid, {", ".join(columns)} FROM {schema}.{name}
+              WHERE rowid > ? ORDER BY rowid LIMIT ?'''
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        out = csv.writer(buffer)
+        out.writerow(columns)
+    last = 0
+    while True:
+        rows = conn.cursor().execute(sql, (last, chunk_size)).fetchall()
+        if not rows:
+            break
+        last = rows[-1][0]
+        if fmt == 'csv':
+            out.writerows(r[1:] for r in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            yield ''.join(json.dumps(dict(zip(columns, r[1:]))) + '\n' for r in rows)
+
+
+def archive(conn, archive_path, vitals_before=None, memberships_ended_before=None,
+            chunk_size=DEFAULTS['ARCHIVE_CHUNK']):
+    """Move old vitals and ended memberships to the archive database.
+
+    Returns the number of rows moved per table. Rows are copied and
+    committed before they are deleted: under WAL a transaction spanning
+    attached databases is only atomic per database, so the archive must
+    hold a row before the main database lets it go. Copies use INSERT OR
+    REPLACE, so rerunning after an interruption is safe.
+
+    The deletes run with the ARCHIVING flag set, so the dashboard stats and
+    vitals rollups keep the moved rows. Vitals are only archived up to the
+    start of the week and month holding `vitals_before`: a later change to
+    a live reading recomputes its rollup buckets from the live rows, which
+    must therefore never share a bucket with archived ones.
+    """
+    attach_archive(conn, archive_path)
+    c = conn.cursor()
+    if vitals_before is not None:
+        # Weeks start on Monday and months on the 1st, as in analytics.PERIODS
+        vitals_before = c.execute("SELECT min(date(?, 'weekday 0', '-6 days'), date(?, 'start of month'))",
+                                  (vitals_before, vitals_before)).fetchone()[0]
+    cutoffs = {'MEMBER_VITALS': vitals_before, 'MEMBERSHIP': memberships_ended_before}
+    moved = {}
+    for table, (key, condition) in ARCHIVE_RULES.items():
+        cutoff = cutoffs[table]
+        if cutoff is None:
+            continue
+        columns = ', '.join(r[1] for r in conn.execute(f'PRAGMA archive.table_info({table})'))
+        moved[table] = 0
+        last = 0
+        while True:
+            # Walk the id order so each chunk continues where the last one stopped
+            ids = [r[0] for r in c.execute(
+                f'SELECT {key} FROM main.{table} WHERE {key} > ? AND {condition} ORDER BY {key} LIMIT ?',
+                (last, cutoff, chunk_size))]
+            if not ids:
+                break
+            last = ids[-1]
+            ids_json = json.dumps(ids)
+            try:
+                c.execute(f'''INSERT OR REPLACE INTO archive.{table} ({columns})
+                              SELECT {columns} FROM main.{table}
+                              WHERE {key} IN (SELECT value FROM json_each(?))''', (ids_json,))
+                conn.commit()
+                # Re-check the condition in case a row changed since it was copied,
+                # and drop archive copies of any row that stays live
+                c.execute('INSERT INTO main.ARCHIVING (active) VALUES (1)')
+                c.execute(f'''DELETE FROM main.{table}
+                              WHERE {key} IN (SELECT value FROM json_each(?)) AND {condition}''',
+                          (ids_json, cutoff))
+                moved[table] += c.rowcount
+                c.execute('DELETE FROM main.ARCHIVING')
+                c.execute(f'''DELETE FROM archive.{table}
+                              WHERE {key} IN (SELECT {key} FROM main.{table}
+                                              WHERE {key} IN (SELECT value FROM json_each(?)))''',
+                          (ids_json,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    return moved
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
@@ -0,0 +1,4 @@
+# Benchmark suite, run from the repository root:
+#     python -m bench.generate --db bench.db --members 100000 --memberships 1000000 --vitals 10000000
+#     python -m bench.run --db bench.db                          (in-process test client)
+#     python -m bench.run --db bench.db --url http://127.0.0.1:5000   (running server)
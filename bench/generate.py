@@ -0,0 +1,201 @@
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+import analytics
+import cache
+import db
+import migrations
+import search
+import stats
+
+# Synthetic gym data at configurable scale. The schema comes from the same
+# migrations init_db() applies; rows are generated from a seeded RNG so a
+# given set of arguments always produces the same database. Derived-data
+# triggers are dropped during the load and reinstalled afterwards, which
+# rebuilds the summary tables, rollups and search indexes in one pass each.
+
+CHUNK_SIZE = 10000
+
+# Fixed "today" so membership status does not depend on when the data is made
+REFERENCE_DATE = date(2025, 12, 31)
+FIRST_DAY = date(2015, 1, 1)
+
+FIRST_NAMES = ['Aarav', 'Aditi', 'Ana', 'Ben', 'Chen', 'Diego', 'Elena', 'Fatima', 'Grace', 'Hiro',
+               'Ishaan', 'Jonas', 'Kavya', 'Liam', 'Maya', 'Noah', 'Olga', 'Priya', 'Quinn', 'Rahul',
+               'Sara', 'Tomas', 'Uma', 'Vikram', 'Wei', 'Yara', 'Zoe']
+LAST_NAMES = ['Ahmed', 'Brown', 'Costa', 'Das', 'Evans', 'Fischer', 'Garcia', 'Hansen', 'Iyer', 'Jensen',
+              'Kumar', 'Lopez', 'Mehta', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Singh', 'Tanaka', 'Wang']
+SPECIALISATIONS = ['Strength', 'Cardio', 'Yoga', 'CrossFit', 'Pilates', 'Nutrition', 'Rehabilitation', 'Boxing']
+FOCUS = ['Full Body', 'Upper Body', 'Lower Body', 'Core', 'Endurance', 'Mobility', 'Hypertrophy', 'Fat Loss']
+DIETS = ['Keto', 'Mediterranean', 'High Protein', 'Vegan', 'Low Carb', 'Balanced', 'Paleo', 'Vegetarian']
+INTENSITY = ['Low', 'Medium', 'High']
+PAYMENT_TYPES = ['Cash', 'Card', 'UPI']
+# type: (days, price)
+MEMBERSHIP_TYPES = {'Monthly': (30, 1500.0), 'Quarterly': (90, 4000.0), 'Yearly': (365, 14000.0)}
+
+
+def random_date(rng, start=FIRST_DAY, end=REFERENCE_DATE):
+    return (start + timedelta(days=rng.randrange((end - start).days + 1))).isoformat()
+
+
+def members(rng, n):
+    for i in range(1, n + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        dob = random_date(rng, date(1955, 1, 1), date(2007, 12, 31))
+        yield (f'{first} {last}', dob, random_date(rng), f'{first}.{last}{i}@example.com'.lower())
+
+
+def phones(rng, n_members):
+    for member_id in range(1, n_members + 1):
+        for k in range(rng.choice((0, 1, 1, 2))):
+            yield member_id, f'+1555{member_id:07d}{k}'
+
+
+def trainers(rng, n):
+    for _ in range(n):
+        yield f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', rng.choice(SPECIALISATIONS)
+
+
+def workouts(rng, n, n_trainers):
+    for i in range(1, n + 1):
+        focus = rng.choice(FOCUS)
+        yield (f'{focus} Program {i}', f'{rng.randint(3, 6)} sessions a week of {focus.lower()} training',
+               rng.choice(INTENSITY), rng.randint(1, n_trainers) if n_trainers else None)
+
+
+def diets(rng, n, n_trainers):
+    for i in range(1, n + 1):
+        name = rng.choice(DIETS)
+        yield (f'{name} Plan {i}', f'{name} meals with {rng.randint(3, 6)} servings a day',
+               rng.randrange(1200, 3600, 50), rng.randint(1, n_trainers) if n_trainers else None)
+
+
+def optional_id(rng, n):
+    # One in five memberships comes without a trainer or plan
+    return rng.randint(1, n) if n and rng.random() < 0.8 else None
+
+
+def memberships(rng, n, n_members, n_trainers, n_workouts, n_diets):
+    types = list(MEMBERSHIP_TYPES)
+    for _ in range(n):
+        kind = rng.choice(types)
+        days, price = MEMBERSHIP_TYPES[kind]
+        start = FIRST_DAY + timedelta(days=rng.randrange((REFERENCE_DATE - FIRST_DAY).days + 1))
+        end = start + timedelta(days=days)
+        if end < REFERENCE_DATE:
+            status = 'Expired'
+        else:
+            status = 'Inactive' if rng.random() < 0.1 else 'Active'
+        yield (kind, start.isoformat(), end.isoformat(), rng.choice(PAYMENT_TYPES), price, status,
+               rng.randint(1, n_members), optional_id(rng, n_diets), optional_id(rng, n_trainers),
+               optional_id(rng, n_workouts))
+
+
+def vitals(rng, n, n_members):
+    for _ in range(n):
+        member_id = rng.randint(1, n_members)
+        # Height is stable per member, weight drifts around it
+        height = 150 + (member_id * 37) % 45
+        weight = round((height - 100) * rng.uniform(0.8, 1.3), 1)
+        yield weight, float(height), random_date(rng), member_id
+
+
+def load(conn, sql, rows, chunk_size=CHUNK_SIZE):
+    c = conn.cursor()
+    chunk, total = [], 0
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            c.executemany(sql, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        c.executemany(sql, chunk)
+        total += len(chunk)
+    return total
+
+
+def generate(path, n_members=10000, n_trainers=200, n_workouts=500, n_diets=500,
+             n_memberships=100000, n_vitals=500000, seed=1, log=print):
+    """Create a database at `path` filled with synthetic rows; return the row counts."""
+    if n_members < 1:
+        raise ValueError('At least one member is required')
+    rng = random.Random(seed)
+    conn = db.connect(path, synchronous='OFF')
+    migrations.migrate(conn)
+
+    triggers = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")]
+    conn.execute('BEGIN IMMEDIATE')
+    for name in triggers:
+        conn.execute(f'DROP TRIGGER {name}')
+
+    steps = [
+        ('MEMBER', 'INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES (?, ?, ?, ?)',
+         members(rng, n_members)),
+        ('MEMBER_PHONE', 'INSERT INTO MEMBER_PHONE (MEMBER_ID, PHONE_NUMBER) VALUES (?, ?)',
+         phones(rng, n_members)),
+        ('TRAINER', 'INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES (?, ?)',
+         trainers(rng, n_trainers)),
+        ('WORKOUT_PLAN', '''INSERT INTO WORKOUT_PLAN (Plan_name, Description, Intensity_level, Trainer_id)
+                            VALUES (?, ?, ?, ?)''', workouts(rng, n_workouts, n_trainers)),
+        ('DIET_PLAN', '''INSERT INTO DIET_PLAN (DietPlan_name, Diet_Description, Target_Calories, Trainer_id)
+                         VALUES (?, ?, ?, ?)''', diets(rng, n_diets, n_trainers)),
+        ('MEMBERSHIP', '''INSERT INTO MEMBERSHIP (Membership_type, Start_date, End_date, Payment_type,
+                              Payment_amount, Status, Member_id, DietPlan_id, Trainer_id, Plan_id)
+                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+         memberships(rng, n_memberships, n_members, n_trainers, n_workouts, n_diets)),
+        ('MEMBER_VITALS', 'INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES (?, ?, ?, ?)',
+         vitals(rng, n_vitals, n_members)),
+    ]
+    counts = {}
+    try:
+        for table, sql, rows in steps:
+            start = time.perf_counter()
+            counts[table] = load(conn, sql, rows)
+            log(f'{table}: {counts[table]} rows in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        for install in (stats.install, analytics.install, search.install, cache.install):
+            install(conn)
+        conn.commit()
+        log(f'Derived tables and search indexes rebuilt in {time.perf_counter() - start:.1f}s')
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('ANALYZE')
+        conn.close()
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fill a new database with synthetic gym data.')
+    parser.add_argument('--db', default='bench.db', help='database file to create')
+    parser.add_argument('--members', type=int, default=10000)
+    parser.add_argument('--trainers', type=int, default=200)
+    parser.add_argument('--workouts', type=int, default=500)
+    parser.add_argument('--diets', type=int, default=500)
+    parser.add_argument('--memberships', type=int, default=100000)
+    parser.add_argument('--vitals', type=int, default=500000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--force', action='store_true', help='replace an existing database file')
+    args = parser.parse_args(argv)
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f'{args.db} exists; pass --force to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    generate(args.db, args.members, args.trainers, args.workouts, args.diets,
+             args.memberships, args.vitals, args.seed)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+# Drives every route in app.py with concurrent clients, either in-process
+# through Flask's test client or over HTTP against a running server, and
+# reports throughput and p50/p95/p99 latency per endpoint. Each endpoint is
+# measured in its own phase so results stay comparable between runs; rows
+# that DELETE and PUT requests act on are created first and not timed.
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class TestClient:
+    def __init__(self, app):
+        self.local = threading.local()
+        self.app = app
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers=headers)
+        data = response.get_data()
+        response.close()
+        return response.status_code, data
+
+
+class HttpClient:
+    # One keep-alive connection per worker thread
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            conn = getattr(self.local, 'conn', None)
+            if conn is None:
+                conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle connection; reconnect once
+                conn.close()
+                self.local.conn = None
+                if attempt == 2:
+                    raise
+
+
+class Scenario:
+    """One endpoint: make(ctx, rng) returns (method, path, body)."""
+
+    def __init__(self, name, make, expect=(200,)):
+        self.name = name
+        self.make = make
+        self.expect = expect
+
+
+class Context:
+    def __init__(self, client, ids):
+        self.client = client
+        self.ids = ids
+        self.lock = threading.Lock()
+
+    def pick(self, rng, table):
+        return rng.randint(1, max(self.ids[table], 1))
+
+    def create(self, resource, body):
+        # Untimed setup for DELETE scenarios
+        status, data = self.client.request('POST', f'/api/{resource}', body)
+        if status != 201:
+            raise RuntimeError(f'Setup POST /api/{resource} failed with {status}: {data[:200]!r}')
+        return next(v for k, v in json.loads(data).items() if k.endswith('_id'))
+
+
+def member_body(rng):
+    n = rng.randrange(10 ** 9)
+    return {'name': f'Bench Member {n}', 'dob': '1990-05-17', 'join_date': '2025-01-01',
+            'email': f'bench{n}@example.com'}
+
+
+def trainer_body(rng):
+    return {'name': f'Bench Trainer {rng.randrange(10 ** 6)}', 'specialisation': 'Strength'}
+
+
+def membership_body(ctx, rng):
+    return {'membership_type': 'Monthly', 'start_date': '2025-06-01', 'end_date': '2025-07-01',
+            'payment_type': 'Card', 'payment_amount': 1500.0, 'status': 'Active',
+            'member_id': ctx.pick(rng, 'MEMBER')}
+
+
+def workout_body(ctx, rng):
+    return {'plan_name': 'Bench Plan', 'description': 'Benchmark workout plan',
+            'intensity_level': 'Medium', 'trainer_id': ctx.pick(rng, 'TRAINER')}
+
+
+def diet_body(ctx, rng):
+    return {'dietplan_name': 'Bench Diet', 'diet_description': 'Benchmark diet plan',
+            'target_calories': 2000, 'trainer_id': ctx.pick(rng, 'TRAINER')}
+
+
+def vitals_body(ctx, rng):
+    return {'weight': round(rng.uniform(50, 110), 1), 'height': 175.0,
+            'record_date': '2025-06-01', 'memb_id': ctx.pick(rng, 'MEMBER')}
+
+
+def page_after(ctx, rng, table):
+    # Keyset pages from random points, so the response cache is not all hits
+    return rng.randrange(max(ctx.ids[table] - 50, 1))
+
+
+SCENARIOS = [
+    Scenario('GET /', lambda ctx, rng: ('GET', '/', None)),
+    Scenario('GET /api/members', lambda ctx, rng: (
+        'GET', f'/api/members?limit=50&after={page_after(ctx, rng, "MEMBER")}', None)),
+    Scenario('POST /api/members', lambda ctx, rng: ('POST', '/api/members', member_body(rng)), (201,)),
+    Scenario('GET /api/members/profiles', lambda ctx, rng: (
+        'GET', '/api/members/profiles?ids=' + ','.join(
+            str(ctx.pick(rng, 'MEMBER')) for _ in range(20)), None)),
+    Scenario('GET /api/members/<id>', lambda ctx, rng: (
+        'GET', f'/api/members/{ctx.pick(rng, "MEMBER")}', None), (200, 404)),
+    Scenario('PUT /api/members/<id>', lambda ctx, rng: (
+        'PUT', f'/api/members/{ctx.create("members", member_body(rng))}', member_body(rng))),
+    Scenario('DELETE /api/members/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/members/{ctx.create("members", member_body(rng))}', None)),
+    Scenario('GET /api/trainers', lambda ctx, rng: (
+        'GET', f'/api/trainers?limit=50&after={page_after(ctx, rng, "TRAINER")}', None)),
+    Scenario('POST /api/trainers', lambda ctx, rng: ('POST', '/api/trainers', trainer_body(rng)), (201,)),
+    Scenario('PUT /api/trainers/<id>', lambda ctx, rng: (
+        'PUT', f'/api/trainers/{ctx.create("trainers", trainer_body(rng))}', trainer_body(rng))),
+    Scenario('DELETE /api/trainers/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/trainers/{ctx.create("trainers", trainer_body(rng))}', None)),
+    Scenario('GET /api/memberships', lambda ctx, rng: (
+        'GET', f'/api/memberships?limit=50&after={page_after(ctx, rng, "MEMBERSHIP")}', None)),
+    Scenario('GET /api/memberships?status', lambda ctx, rng: (
+        'GET', f'/api/memberships?status=Active&member_id={ctx.pick(rng, "MEMBER")}', None)),
+    Scenario('POST /api/memberships', lambda ctx, rng: (
+        'POST', '/api/memberships', membership_body(ctx, rng)), (201,)),
+    Scenario('DELETE /api/memberships/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/memberships/{ctx.create("memberships", membership_body(ctx, rng))}', None)),
+    Scenario('GET /api/workouts', lambda ctx, rng: (
+        'GET', f'/api/workouts?limit=50&after={page_after(ctx, rng, "WORKOUT_PLAN")}', None)),
+    Scenario('POST /api/workouts', lambda ctx, rng: (
+        'POST', '/api/workouts', workout_body(ctx, rng)), (201,)),
+    Scenario('DELETE /api/workouts/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/workouts/{ctx.create("workouts", workout_body(ctx, rng))}', None)),
+    Scenario('GET /api/diets', lambda ctx, rng: (
+        'GET', f'/api/diets?limit=50&after={page_after(ctx, rng, "DIET_PLAN")}', None)),
+    Scenario('POST /api/diets', lambda ctx, rng: ('POST', '/api/diets', diet_body(ctx, rng)), (201,)),
+    Scenario('DELETE /api/diets/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/diets/{ctx.create("diets", diet_body(ctx, rng))}', None)),
+    Scenario('GET /api/vitals', lambda ctx, rng: (
+        'GET', f'/api/vitals?limit=50&after={page_after(ctx, rng, "MEMBER_VITALS")}', None)),
+    Scenario('GET /api/vitals?memb_id', lambda ctx, rng: (
+        'GET', f'/api/vitals?memb_id={ctx.pick(rng, "MEMBER")}', None)),
+    Scenario('POST /api/vitals', lambda ctx, rng: ('POST', '/api/vitals', vitals_body(ctx, rng)), (201,)),
+    Scenario('DELETE /api/vitals/<id>', lambda ctx, rng: (
+        'DELETE', f'/api/vitals/{ctx.create("vitals", vitals_body(ctx, rng))}', None)),
+    Scenario('GET /api/stats', lambda ctx, rng: ('GET', '/api/stats', None)),
+    Scenario('GET /api/members/<id>/vitals/series', lambda ctx, rng: (
+        'GET', f'/api/members/{ctx.pick(rng, "MEMBER")}/vitals/series?window=7', None)),
+    Scenario('GET /api/members/<id>/vitals/rollup', lambda ctx, rng: (
+        'GET', f'/api/members/{ctx.pick(rng, "MEMBER")}/vitals/rollup?period='
+               + rng.choice(('week', 'month')), None)),
+    Scenario('GET /api/search', lambda ctx, rng: (
+        'GET', '/api/search?q=' + rng.choice(('ana', 'patel', 'strength', 'keto plan', 'core', 'singh m')),
+        None)),
+    Scenario('POST /api/<resource>/batch', lambda ctx, rng: (
+        'POST', '/api/vitals/batch', [vitals_body(ctx, rng) for _ in range(100)]), (201,)),
+    Scenario('DELETE /api/<resource>/batch', lambda ctx, rng: (
+        'DELETE', '/api/members/batch',
+        {'ids': [ctx.create('members', member_body(rng)) for _ in range(10)]})),
+    Scenario('GET /metrics', lambda ctx, rng: ('GET', '/metrics', None)),
+]
+
+
+def percentile(sorted_values, p):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * p // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_scenario(ctx, scenario, requests, concurrency, seed):
+    latencies, errors = [], []
+    record = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker(index):
+        rng = random.Random(f'{seed}:{scenario.name}:{index}')
+        while True:
+            with record:
+                if next(counter, None) is None:
+                    return
+            method, path, body = scenario.make(ctx, rng)
+            start = time.perf_counter()
+            status, data = ctx.client.request(method, path, body)
+            elapsed = time.perf_counter() - start
+            with record:
+                latencies.append(elapsed)
+                if status not in scenario.expect:
+                    errors.append(f'{status} {method} {path}: {data[:200]!r}')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for future in [pool.submit(worker, i) for i in range(concurrency)]:
+            future.result()
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    ms = lambda s: None if s is None else round(s * 1000, 3)
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        # Includes untimed setup, so write throughput for DELETE/PUT is a lower bound
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+def table_sizes(path):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        return {table: conn.execute(f'SELECT COALESCE(MAX(rowid), 0) FROM {table}').fetchone()[0]
+                for table in ('MEMBER', 'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN', 'MEMBERSHIP', 'MEMBER_VITALS')}
+    finally:
+        conn.close()
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(client, ids, scenarios, requests=200, concurrency=8, seed=1, log=print):
+    ctx = Context(client, ids)
+    results = {}
+    for scenario in scenarios:
+        # A few untimed requests so first-use costs (pool, statement cache) are not measured
+        warm = random.Random(seed)
+        for _ in range(min(3, requests)):
+            method, path, body = scenario.make(ctx, warm)
+            client.request(method, path, body)
+        results[scenario.name] = r = run_scenario(ctx, scenario, requests, concurrency, seed)
+        log(f'{scenario.name:40} {r["throughput_rps"]:>9} req/s  p50 {r["p50_ms"]:>8} ms  '
+            f'p95 {r["p95_ms"]:>8} ms  p99 {r["p99_ms"]:>8} ms' + (f'  errors {r["errors"]}' if r['errors'] else ''))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every API route.')
+    parser.add_argument('--db', default='bench.db',
+                        help='database to benchmark (read for id ranges; the test client also serves it)')
+    parser.add_argument('--url', help='base URL of a running server; omit to use the in-process test client')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--only', help='run endpoints whose name contains this text')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON results file (default bench/results/<timestamp>.json)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        parser.error(f'{args.db} not found; create it with python -m bench.generate')
+    ids = table_sizes(args.db)
+
+    if args.url:
+        client = HttpClient(args.url)
+        target = args.url
+    else:
+        from app import app
+        app.config['DATABASE'] = args.db
+        client = TestClient(app)
+        target = 'test-client'
+
+    scenarios = [s for s in SCENARIOS if not args.only or args.only in s.name]
+    started = datetime.now()
+    results = run(client, ids, scenarios, args.requests, args.concurrency, args.seed)
+
+    report = {
+        'started_at': started.isoformat(timespec='seconds'),
+        'target': target,
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'database': os.path.abspath(args.db),
+        'rows': ids,
+        'requests_per_endpoint': args.requests,
+        'concurrency': args.concurrency,
+        'seed': args.seed,
+        'endpoints': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, started.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'Results saved to {output}')
+    return 1 if any(r['errors'] for r in results.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+import sqlite3
+
+# Rows are inserted with executemany in chunks of this size, all inside
+# one transaction per request
+CHUNK_SIZE = 1000
+
+# Batch-insertable resources: table and (field, column, type, required)
+RESOURCES = {
+    'members': ('MEMBER', [
+        ('name', 'NAME', str, True),
+        ('dob', 'DOB', str, True),
+        ('join_date', 'JOIN_DATE', str, True),
+        ('email', 'EMAIL', str, True),
+    ]),
+    'trainers': ('TRAINER', [
+        ('name', 'NAME', str, True),
+        ('specialisation', 'SPECIALISATION', str, True),
+    ]),
+    'memberships': ('MEMBERSHIP', [
+        ('membership_type', 'Membership_type', str, True),
+        ('start_date', 'Start_date', str, True),
+        ('end_date', 'End_date', str, True),
+        ('payment_type', 'Payment_type', str, True),
+        ('payment_amount', 'Payment_amount', float, True),
+        ('status', 'Status', str, True),
+        ('member_id', 'Member_id', int, True),
+        ('dietplan_id', 'DietPlan_id', int, False),
+        ('trainer_id', 'Trainer_id', int, False),
+        ('plan_id', 'Plan_id', int, False),
+    ]),
+    'workouts': ('WORKOUT_PLAN', [
+        ('plan_name', 'Plan_name', str, True),
+        ('description', 'Description', str, True),
+        ('intensity_level', 'Intensity_level', str, True),
+        ('trainer_id', 'Trainer_id', int, False),
+    ]),
+    'diets': ('DIET_PLAN', [
+        ('dietplan_name', 'DietPlan_name', str, True),
+        ('diet_description', 'Diet_Description', str, True),
+        ('target_calories', 'Target_Calories', int, True),
+        ('trainer_id', 'Trainer_id', int, False),
+    ]),
+    'vitals': ('MEMBER_VITALS', [
+        ('weight', 'WEIGHT', float, True),
+        ('height', 'HEIGHT', float, True),
+        ('record_date', 'RECORD_DATE', str, True),
+        ('memb_id', 'MEMB_ID', int, True),
+    ]),
+}
+
+# Foreign keys checked before inserting: (field, referenced table, key column)
+REFERENCES = {
+    'memberships': [
+        ('member_id', 'MEMBER', 'MEMBER_ID'),
+        ('dietplan_id', 'DIET_PLAN', 'DietPlan_id'),
+        ('trainer_id', 'TRAINER', 'TRAINER_ID'),
+        ('plan_id', 'WORKOUT_PLAN', 'Plan_ID'),
+    ],
+    'workouts': [('trainer_id', 'TRAINER', 'TRAINER_ID')],
+    'diets': [('trainer_id', 'TRAINER', 'TRAINER_ID')],
+    'vitals': [('memb_id', 'MEMBER', 'MEMBER_ID')],
+}
+
+
+class Line(str):
+    """One NDJSON line, parsed in prepare() so a malformed line fails alone."""
+
+
+def read_rows(request):
+    """Yield rows from a JSON array, NDJSON or CSV request body."""
+    mimetype = request.mimetype
+    if mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in io.TextIOWrapper(request.stream, encoding='utf-8'):
+            if line.strip():
+                yield Line(line)
+    elif mimetype == 'text/csv':
+        yield from csv.DictReader(io.TextIOWrapper(request.stream, encoding='utf-8-sig'))
+    else:
+        rows = request.get_json()
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array of rows')
+        yield from rows
+
+
+def validate(fields, row):
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    values = []
+    for field, _, convert, required in fields:
+        value = row.get(field)
+        # CSV has no null, so an empty cell counts as missing
+        if value is None or value == '':
+            if required:
+                raise ValueError(f'Missing field: {field}')
+            values.append(None)
+            continue
+        try:
+            values.append(convert(value))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid value for {field}: {value!r}')
+    return values
+
+
+def prepare(resource, rows):
+    """Validate rows; return (results, pending) with rejected rows filled in.
+
+    pending holds (index, values) for the valid rows; their results entries
+    stay None until insert_rows() assigns the new ids.
+    """
+    fields = RESOURCES[resource][1]
+    results, pending = [], []
+    for index, row in enumerate(rows):
+        try:
+            if isinstance(row, Line):
+                try:
+                    row = json.loads(row)
+                except ValueError:
+                    raise ValueError('Invalid JSON') from None
+            pending.append((index, validate(fields, row)))
+            results.append(None)
+        except ValueError as e:
+            results.append({'index': index, 'error': str(e)})
+    return results, pending
+
+
+def missing_references(c, resource, chunk):
+    """Return {index: error} for rows that point at ids which do not exist.
+
+    One query per foreign key column looks up every distinct id in the chunk.
+    """
+    fields = [f[0] for f in RESOURCES[resource][1]]
+    errors = {}
+    for field, table, key in REFERENCES.get(resource, ()):
+        position = fields.index(field)
+        ids = {values[position] for _, values in chunk if values[position] is not None}
+        if not ids:
+            continue
+        missing = {r[0] for r in c.execute(
+            f'''SELECT value FROM json_each(?)
+                WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {key} = value)''',
+            (json.dumps(sorted(ids)),))}
+        for index, values in chunk:
+            if values[position] in missing:
+                errors.setdefault(index, f'Unknown {field}: {values[position]}')
+    return errors
+
+
+def insert_rows(c, resource, pending, results, chunk_size=CHUNK_SIZE):
+    """Insert prepared rows with executemany; the caller owns the transaction.
+
+    Rows referencing missing ids are rejected individually. If a chunk
+    still violates a constraint, that chunk is rolled back and retried row
+    by row so only the offending rows fail. Returns the number of rows
+    inserted.
+    """
+    table, fields = RESOURCES[resource]
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        table, ', '.join(f[1] for f in fields), ', '.join('?' * len(fields)))
+
+    # Take the write lock up front so referenced rows cannot disappear
+    # between the check and the insert, and the savepoints below nest
+    # inside the caller's transaction instead of committing on release
+    if not c.connection.in_transaction:
+        c.execute('BEGIN IMMEDIATE')
+    inserted = 0
+    for start in range(0, len(pending), chunk_size):
+        chunk = pending[start:start + chunk_size]
+        errors = missing_references(c, resource, chunk)
+        for index, error in errors.items():
+            results[index] = {'index': index, 'error': error}
+        chunk = [(index, values) for index, values in chunk if index not in errors]
+        if not chunk:
+            continue
+
+        c.execute('SAVEPOINT bulk_chunk')
+        try:
+            c.executemany(sql, [values for _, values in chunk])
+        except sqlite3.IntegrityError:
+            c.execute('ROLLBACK TO bulk_chunk')
+            c.execute('RELEASE bulk_chunk')
+            # A failing INSERT undoes only itself, so no savepoint per row
+            for index, values in chunk:
+                try:
+                    results[index] = {'index': index, 'id': c.execute(sql, values).lastrowid}
+                    inserted += 1
+                except sqlite3.IntegrityError as e:
+                    results[index] = {'index': index, 'error': f'Constraint violation: {e}'}
+            continue
+        c.execute('RELEASE bulk_chunk')
+        # The transaction holds the write lock, so AUTOINCREMENT ids of a
+        # chunk are contiguous and end at the table's sequence value
+        last_id = c.execute('SELECT seq FROM sqlite_sequence WHERE name=?', (table,)).fetchone()[0]
+        first_id = last_id - len(chunk) + 1
+        for offset, (index, _) in enumerate(chunk):
+            results[index] = {'index': index, 'id': first_id + offset}
+        inserted += len(chunk)
+    return inserted
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import Response, current_app, g, request
+
+from db import get_db, run_script
+
+DEFAULTS = {
+    'RESPONSE_CACHE_ENTRIES': 512,
+    'RESPONSE_CACHE_BYTES': 32 * 1024 * 1024,
+}
+
+# Response headers worth replaying on a cache hit
+KEPT_HEADERS = ('X-Next-After', 'X-Truncated', 'Link')
+
+# Tables whose writes bump their row in TABLE_VERSION, by trigger, so every
+# connection and process that writes the database invalidates the cache.
+# STATS has no triggers; it is bumped when the summary tables are rebuilt.
+VERSIONED_TABLES = ('MEMBER', 'MEMBER_PHONE', 'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN',
+                    'MEMBERSHIP', 'MEMBER_VITALS')
+
+
+def version_triggers(table):
+    name = table.lower()
+    return ''.join(f'''
+CREATE TRIGGER IF NOT EXISTS version_{name}_{event.lower()} AFTER {event} ON {table} BEGIN
+    UPDATE TABLE_VERSION SET version = version + 1 WHERE name = '{table}';
+END;''' for event in ('INSERT', 'UPDATE', 'DELETE'))
+
+
+def install(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS TABLE_VERSION (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )''')
+    for table in VERSIONED_TABLES + ('STATS',):
+        conn.execute('INSERT OR IGNORE INTO TABLE_VERSION (name) VALUES (?)', (table,))
+    run_script(conn, ''.join(version_triggers(t) for t in VERSIONED_TABLES))
+    # Anything cached before a reinstall is stale
+    conn.execute('UPDATE TABLE_VERSION SET version = version + 1')
+
+
+def bump(c, *tables):
+    c.execute('UPDATE TABLE_VERSION SET version = version + 1 WHERE name IN (SELECT value FROM json_each(?))',
+              (json.dumps(tables),))
+
+
+class ResponseCache:
+    """LRU cache of serialized GET responses, invalidated per table.
+
+    Entries are keyed on the request URL plus the TABLE_VERSION rows of the
+    tables they were built from, so a committed write from any connection
+    or process makes every dependent entry unreachable at once and the
+    stale entries age out of the LRU.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        size = len(entry[0])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[0])
+            self._entries[key] = entry
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.extensions['fitness_cache'] = ResponseCache(app.config['RESPONSE_CACHE_ENTRIES'],
+                                                    app.config['RESPONSE_CACHE_BYTES'])
+
+
+def get_cache():
+    return current_app.extensions['fitness_cache']
+
+
+def table_versions():
+    # Read once per request; a write committed after this only makes the
+    # entry stored below unreachable, never serves stale data
+    if 'table_versions' not in g:
+        g.table_versions = dict(get_db().execute('SELECT name, version FROM TABLE_VERSION'))
+    return g.table_versions
+
+
+def cached_response(tables, build):
+    """Serve build() from the cache with a strong ETag and conditional GET.
+
+    tables lists every table the response is read from (archive.X counts
+    as X, whose deletes move rows there); build() is only called on a miss
+    and must return a 200 response to be stored.
+    """
+    response_cache = get_cache()
+    versions = table_versions()
+    key = (request.full_path,) + tuple(versions.get(t.rpartition('.')[2], 0) for t in tables)
+    entry = response_cache.get(key)
+    if entry is None:
+        response = build()
+        if not isinstance(response, Response) or response.status_code != 200:
+            return response
+        body = response.get_data()
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        headers = {h: response.headers[h] for h in KEPT_HEADERS if h in response.headers}
+        entry = (body, etag, response.mimetype, headers)
+        response_cache.put(key, entry)
+
+    body, etag, mimetype, headers = entry
+    response = Response(body, mimetype=mimetype, headers=headers)
+    response.set_etag(etag)
+    # Clients may keep the body but must revalidate; a match costs a 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
@@ -0,0 +1,181 @@
+import queue
+import sqlite3
+import threading
+
+from flask import current_app, g
+
+import backup
+from metrics import InstrumentedConnection
+from writer import WriteCoordinator
+
+# Defaults for the connection layer; override through app.config or
+# FITNESS_* environment variables (e.g. FITNESS_DATABASE=/srv/gym.db)
+DEFAULTS = {
+    'DATABASE': 'database.db',
+    'DB_BUSY_TIMEOUT': 5000,          # milliseconds to wait on a locked database
+    'DB_SYNCHRONOUS': 'NORMAL',       # NORMAL is durable enough under WAL
+    'DB_CACHED_STATEMENTS': 256,      # prepared statements kept per connection
+    'DB_POOL_SIZE': 8,
+    'DB_POOL_TIMEOUT_MS': 5000,       # how long a request waits for a free connection
+    'DB_WRITE_QUEUE': False,          # route writes through the group-commit writer thread
+    'DB_WRITE_WINDOW_MS': 2,          # how long the writer waits to fill a batch
+    'DB_WRITE_BATCH': 256,            # most operations committed together
+    'ARCHIVE_DATABASE': None,         # attached as `archive` when set (see backup.py)
+}
+
+SYNCHRONOUS_LEVELS = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def connect(path, busy_timeout=DEFAULTS['DB_BUSY_TIMEOUT'],
+            synchronous=DEFAULTS['DB_SYNCHRONOUS'],
+            cached_statements=DEFAULTS['DB_CACHED_STATEMENTS']):
+    synchronous = str(synchronous).upper()
+    if synchronous not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f'Invalid synchronous level: {synchronous}')
+
+    conn = sqlite3.connect(path, timeout=busy_timeout / 1000,
+                           cached_statements=cached_statements,
+                           check_same_thread=False,
+                           factory=InstrumentedConnection)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+    conn.execute(f'PRAGMA synchronous={synchronous}')
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+
+def run_script(conn, script):
+    # executescript() would commit our transaction, so split on ';' instead
+    # while keeping trigger bodies (BEGIN ... END;) in one statement
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ''
+    if statement.strip():
+        conn.execute(statement)
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free in time."""
+
+
+class ConnectionPool:
+    """Bounded pool of configured connections shared by all request threads."""
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self.factory()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise PoolTimeout(f'No database connection became free within {timeout}s') from None
+
+    def release(self, conn):
+        # Never hand a half-finished transaction to the next request
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._created -= 1
+
+
+def connect_app(app):
+    config = app.config
+    conn = connect(config['DATABASE'],
+                   busy_timeout=config['DB_BUSY_TIMEOUT'],
+                   synchronous=config['DB_SYNCHRONOUS'],
+                   cached_statements=config['DB_CACHED_STATEMENTS'])
+    if config['ARCHIVE_DATABASE']:
+        backup.attach_archive(conn, config['ARCHIVE_DATABASE'])
+    return conn
+
+
+_pool_lock = threading.Lock()
+
+
+def get_pool(app=None):
+    app = app or current_app._get_current_object()
+    pool = app.extensions.get('fitness_db')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('fitness_db')
+            if pool is None:
+                pool = ConnectionPool(lambda: connect_app(app), app.config['DB_POOL_SIZE'])
+                app.extensions['fitness_db'] = pool
+    return pool
+
+
+def get_db():
+    """Return the pooled connection bound to the current app context."""
+    if 'db' not in g:
+        g.db = get_pool().acquire(current_app.config['DB_POOL_TIMEOUT_MS'] / 1000)
+    return g.db
+
+
+def release_db(exc=None):
+    conn = g.pop('db', None)
+    if conn is not None:
+        get_pool().release(conn)
+
+
+def get_writer(app=None):
+    app = app or current_app._get_current_object()
+    if not app.config['DB_WRITE_QUEUE']:
+        return None
+    writer = app.extensions.get('fitness_writer')
+    if writer is None:
+        with _pool_lock:
+            writer = app.extensions.get('fitness_writer')
+            if writer is None:
+                writer = WriteCoordinator(lambda: connect_app(app),
+                                          window=app.config['DB_WRITE_WINDOW_MS'] / 1000,
+                                          max_batch=app.config['DB_WRITE_BATCH'])
+                app.extensions['fitness_writer'] = writer
+    return writer
+
+
+def write(op):
+    """Run op(cursor) in a committed transaction and return its result."""
+    writer = get_writer()
+    if writer is not None:
+        return writer.submit(op)
+    conn = get_db()
+    try:
+        result = op(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    app.teardown_appcontext(release_db)
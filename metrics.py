@@ -0,0 +1,336 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from flask import Response, g, request
+
+# Request and SQL instrumentation exposed in Prometheus text format at
+# /metrics. Every connection handed out by db.connect() uses the cursor
+# below, so all handlers are covered; recording is a dict update under a
+# lock per request or statement, cheap enough to leave on in production.
+
+DEFAULTS = {
+    'SLOW_QUERY_MS': 200,       # log statements slower than this; None disables
+    'DB_LOCK_RETRIES': 2,       # retries for a statement that hit "database is locked"
+    'DB_LOCK_RETRY_TIMEOUT_MS': 250,  # busy_timeout while retrying, instead of the full one
+}
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_log = logging.getLogger('fitness.sql.slow')
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                break
+        else:
+            i = len(BUCKETS)
+        self.counts[i] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}       # (endpoint, method) -> Histogram
+        self.responses = {}      # (endpoint, method, status) -> count
+        self.statements = {}     # sql -> [calls, seconds, rows, errors]
+        self.sql = Histogram()
+        self.lock_errors = 0
+        self.lock_retries = 0
+        self.lock_wait = 0.0
+        self.slow_query_seconds = DEFAULTS['SLOW_QUERY_MS'] / 1000
+        self.lock_retry_limit = DEFAULTS['DB_LOCK_RETRIES']
+        self.lock_retry_timeout_ms = DEFAULTS['DB_LOCK_RETRY_TIMEOUT_MS']
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self.lock:
+            histogram = self.requests.get((endpoint, method))
+            if histogram is None:
+                histogram = self.requests[(endpoint, method)] = Histogram()
+            histogram.observe(seconds)
+            key = (endpoint, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_statement(self, sql, seconds, rows=0, error=False):
+        with self.lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                stats = self.statements[sql] = [0, 0.0, 0, 0]
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += rows
+            stats[3] += error
+            self.sql.observe(seconds)
+
+    def count_lock(self, retried, seconds):
+        with self.lock:
+            self.lock_errors += 1
+            self.lock_retries += retried
+            self.lock_wait += seconds
+
+    def render(self):
+        lines = []
+        with self.lock:
+            lines += ['# HELP fitness_request_seconds Request latency by endpoint',
+                      '# TYPE fitness_request_seconds histogram']
+            for (endpoint, method), h in sorted(self.requests.items()):
+                lines += histogram_lines('fitness_request_seconds', h,
+                                         f'endpoint="{label(endpoint)}",method="{method}"')
+            lines += ['# HELP fitness_responses_total Responses by endpoint and status',
+                      '# TYPE fitness_responses_total counter']
+            for (endpoint, method, status), n in sorted(self.responses.items()):
+                lines.append(f'fitness_responses_total{{endpoint="{label(endpoint)}",'
+                             f'method="{method}",status="{status}"}} {n}')
+
+            lines += ['# HELP fitness_sql_seconds Statement execution time',
+                      '# TYPE fitness_sql_seconds histogram']
+            lines += histogram_lines('fitness_sql_seconds', self.sql, '')
+            for name, index, kind, help_text in (
+                    ('fitness_sql_statement_calls_total', 0, 'counter', 'Executions per statement'),
+                    ('fitness_sql_statement_seconds_total', 1, 'counter', 'Execution time per statement'),
+                    ('fitness_sql_statement_rows_total', 2, 'counter', 'Rows fetched or changed per statement'),
+                    ('fitness_sql_statement_errors_total', 3, 'counter', 'Failed executions per statement')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for sql, stats in sorted(self.statements.items()):
+                    lines.append(f'{name}{{statement="{label(sql)}"}} {stats[index]}')
+
+            # SQLite waits out a lock inside its busy handler, which Python cannot
+            # observe; these count attempts that still found the database locked
+            # after that wait, and the time those attempts and their backoff took
+            lines += ['# HELP fitness_db_lock_errors_total Attempts that timed out waiting on a locked database',
+                      '# TYPE fitness_db_lock_errors_total counter',
+                      f'fitness_db_lock_errors_total {self.lock_errors}',
+                      '# HELP fitness_db_lock_retries_total Statements retried after a lock timeout',
+                      '# TYPE fitness_db_lock_retries_total counter',
+                      f'fitness_db_lock_retries_total {self.lock_retries}',
+                      '# HELP fitness_db_lock_wait_seconds_total Time spent in timed-out attempts and retry backoff',
+                      '# TYPE fitness_db_lock_wait_seconds_total counter',
+                      f'fitness_db_lock_wait_seconds_total {self.lock_wait}']
+        return '\n'.join(lines) + '\n'
+
+
+def histogram_lines(name, h, labels):
+    sep = ',' if labels else ''
+    lines, cumulative = [], 0
+    for bound, count in zip(BUCKETS + ('+Inf',), h.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}{sep}le="{bound}"}} {cumulative}')
+    suffix = f'{{{labels}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {h.sum}')
+    lines.append(f'{name}_count{suffix} {cumulative}')
+    return lines
+
+
+def label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+REGISTRY = Registry()
+
+_whitespace = re.compile(r'\s+')
+_normalized = {}
+
+
+def normalize(sql):
+    # Statements are static strings with bound parameters, so the cache of
+    # collapsed forms stays as small as the set of queries in the code
+    text = _normalized.get(sql)
+    if text is None:
+        text = _normalized[sql] = _whitespace.sub(' ', sql).strip()[:300]
+    return text
+
+
+def param_shape(params):
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+
+
+def is_lock_error(e):
+    message = str(e)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def record(text, elapsed, rows, shape):
+    REGISTRY.observe_statement(text, elapsed, rows)
+    if REGISTRY.slow_query_seconds is not None and elapsed >= REGISTRY.slow_query_seconds:
+        slow_log.warning('%.1f ms: %s params=%s', elapsed * 1000, text,
+                         shape if isinstance(shape, str) else param_shape(shape))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records timing, row counts and lock errors per statement.
+
+    SQLite does most of the work of a query while rows are stepped through,
+    so a statement's time includes its fetches. It is recorded once it is
+    finished: right away when it returns no rows, otherwise when its rows
+    run out or the cursor is reused, closed or collected.
+    """
+
+    _sql = None
+
+    def execute(self, sql, params=()):
+        return self._run(super().execute, sql, params, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        shape = f'{len(seq_of_params)} x ' + (param_shape(seq_of_params[0]) if seq_of_params else '()')
+        return self._run(super().executemany, sql, seq_of_params, shape)
+
+    def _run(self, method, sql, params, shape):
+        self._finish()
+        text = normalize(sql)
+        registry = REGISTRY
+        conn = self.connection
+        # A statement that opens the transaction can be retried from scratch
+        idle = not conn.in_transaction
+        retries, restore = 0, None
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    result = method(sql, params)
+                    break
+                except sqlite3.OperationalError as e:
+                    elapsed = time.perf_counter() - start
+                    registry.observe_statement(text, elapsed, error=True)
+                    if not is_lock_error(e):
+                        raise
+                    retry = idle and retries < registry.lock_retry_limit
+                    backoff = 0.01 * (retries + 1) if retry else 0.0
+                    registry.count_lock(retry, elapsed + backoff)
+                    if not retry:
+                        raise
+                    if conn.in_transaction:
+                        conn.rollback()
+                    if restore is None:
+                        # Retries wait briefly instead of another full busy_timeout
+                        raw = conn.cursor(sqlite3.Cursor)
+                        restore = raw.execute('PRAGMA busy_timeout').fetchone()[0]
+                        raw.execute(f'PRAGMA busy_timeout={int(registry.lock_retry_timeout_ms)}')
+                    retries += 1
+                    time.sleep(backoff)
+        finally:
+            if restore is not None:
+                conn.cursor(sqlite3.Cursor).execute(f'PRAGMA busy_timeout={restore}')
+
+        self._sql, self._shape = text, shape
+        self._elapsed = time.perf_counter() - start
+        self._rows = max(self.rowcount, 0)
+        if self.description is None:
+            self._finish()
+        return result
+
+    def _finish(self):
+        text = self._sql
+        if text is not None:
+            self._sql = None
+            record(text, self._elapsed, self._rows, self._shape)
+
+    def _fetched(self, start, rows, done):
+        if self._sql is not None:
+            self._elapsed += time.perf_counter() - start
+            self._rows += rows
+            if done:
+                self._finish()
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows), True)
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0, True)
+            raise
+        self._fetched(start, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    # Connection.execute() and commit() do not go through cursor(), so they
+    # are routed through the instrumented cursor here
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def commit(self):
+        if not self.in_transaction:
+            return super().commit()
+        start = time.perf_counter()
+        try:
+            super().commit()
+        except sqlite3.Error:
+            REGISTRY.observe_statement('COMMIT', time.perf_counter() - start, error=True)
+            raise
+        record('COMMIT', time.perf_counter() - start, 0, ())
+
+
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+def record_request(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        REGISTRY.observe_request(request.endpoint or 'unmatched', request.method,
+                                 response.status_code, time.perf_counter() - start)
+    return response
+
+
+def metrics_view():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    for key, value in DEFAULTS.items():
+        app.config.setdefault(key, value)
+    slow_ms = app.config['SLOW_QUERY_MS']
+    REGISTRY.slow_query_seconds = None if slow_ms is None else slow_ms / 1000
+    REGISTRY.lock_retry_limit = app.config['DB_LOCK_RETRIES']
+    REGISTRY.lock_retry_timeout_ms = app.config['DB_LOCK_RETRY_TIMEOUT_MS']
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,251 @@
+import sqlite3
+import sys
+from datetime import datetime
+
+import analytics
+import backup
+import cache
+import search
+import stats
+from db import run_script
+
+# Versioned schema migrations. Each entry is (version, name, step) where
+# step is either an SQL script or a function taking the connection. Steps
+# run in order inside their own transaction, and applied versions are
+# recorded in SCHEMA_VERSION. Run once per deploy:
+#     flask --app app migrate        or        python migrations.py [db path]
+
+BASELINE = '''
+CREATE TABLE IF NOT EXISTS MEMBER (
+    MEMBER_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    NAME TEXT NOT NULL,
+    DOB TEXT,
+    JOIN_DATE TEXT,
+    EMAIL TEXT
+);
+
+CREATE TABLE IF NOT EXISTS MEMBER_PHONE (
+    MEMBER_ID INTEGER,
+    PHONE_NUMBER TEXT,
+    FOREIGN KEY (MEMBER_ID) REFERENCES MEMBER(MEMBER_ID),
+    PRIMARY KEY (MEMBER_ID, PHONE_NUMBER)
+);
+
+CREATE TABLE IF NOT EXISTS TRAINER (
+    TRAINER_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    NAME TEXT NOT NULL,
+    SPECIALISATION TEXT
+);
+
+CREATE TABLE IF NOT EXISTS WORKOUT_PLAN (
+    Plan_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Plan_name TEXT,
+    Description TEXT,
+    Intensity_level TEXT,
+    Trainer_id INTEGER,
+    FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID)
+);
+
+CREATE TABLE IF NOT EXISTS DIET_PLAN (
+    DietPlan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    DietPlan_name TEXT,
+    Diet_Description TEXT,
+    Target_Calories INTEGER,
+    Trainer_id INTEGER,
+    FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID)
+);
+
+CREATE TABLE IF NOT EXISTS MEMBERSHIP (
+    Membership_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    Membership_type TEXT,
+    Start_date TEXT,
+    End_date TEXT,
+    Payment_type TEXT,
+    Payment_amount REAL,
+    Status TEXT,
+    Member_id INTEGER,
+    DietPlan_id INTEGER,
+    Trainer_id INTEGER,
+    Plan_id INTEGER,
+    FOREIGN KEY (Member_id) REFERENCES MEMBER(MEMBER_ID),
+    FOREIGN KEY (DietPlan_id) REFERENCES DIET_PLAN(DietPlan_id),
+    FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID),
+    FOREIGN KEY (Plan_id) REFERENCES WORKOUT_PLAN(Plan_ID)
+);
+
+CREATE TABLE IF NOT EXISTS MEMBER_VITALS (
+    VITALS_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    WEIGHT REAL,
+    HEIGHT REAL,
+    RECORD_DATE TEXT,
+    MEMB_ID INTEGER,
+    FOREIGN KEY (MEMB_ID) REFERENCES MEMBER(MEMBER_ID)
+);
+'''
+
+# Tables rebuilt with ON DELETE actions, so deleting a member cascades to
+# its phones, memberships and vitals and deleting a trainer or plan clears
+# the references to it
+FOREIGN_KEY_TABLES = {
+    'MEMBER_PHONE': '''
+        MEMBER_ID INTEGER,
+        PHONE_NUMBER TEXT,
+        FOREIGN KEY (MEMBER_ID) REFERENCES MEMBER(MEMBER_ID) ON DELETE CASCADE,
+        PRIMARY KEY (MEMBER_ID, PHONE_NUMBER)''',
+    'WORKOUT_PLAN': '''
+        Plan_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Plan_name TEXT,
+        Description TEXT,
+        Intensity_level TEXT,
+        Trainer_id INTEGER,
+        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID) ON DELETE SET NULL''',
+    'DIET_PLAN': '''
+        DietPlan_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        DietPlan_name TEXT,
+        Diet_Description TEXT,
+        Target_Calories INTEGER,
+        Trainer_id INTEGER,
+        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID) ON DELETE SET NULL''',
+    'MEMBERSHIP': '''
+        Membership_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        Membership_type TEXT,
+        Start_date TEXT,
+        End_date TEXT,
+        Payment_type TEXT,
+        Payment_amount REAL,
+        Status TEXT,
+        Member_id INTEGER,
+        DietPlan_id INTEGER,
+        Trainer_id INTEGER,
+        Plan_id INTEGER,
+        FOREIGN KEY (Member_id) REFERENCES MEMBER(MEMBER_ID) ON DELETE CASCADE,
+        FOREIGN KEY (DietPlan_id) REFERENCES DIET_PLAN(DietPlan_id) ON DELETE SET NULL,
+        FOREIGN KEY (Trainer_id) REFERENCES TRAINER(TRAINER_ID) ON DELETE SET NULL,
+        FOREIGN KEY (Plan_id) REFERENCES WORKOUT_PLAN(Plan_ID) ON DELETE SET NULL''',
+    'MEMBER_VITALS': '''
+        VITALS_ID INTEGER PRIMARY KEY AUTOINCREMENT,
+        WEIGHT REAL,
+        HEIGHT REAL,
+        RECORD_DATE TEXT,
+        MEMB_ID INTEGER,
+        FOREIGN KEY (MEMB_ID) REFERENCES MEMBER(MEMBER_ID) ON DELETE CASCADE''',
+}
+
+# Dangling references left by older code are cleared before the rebuild
+# so the new constraints hold; phones without a member are dropped
+ORPHAN_CLEANUP = '''
+DELETE FROM MEMBER_PHONE WHERE MEMBER_ID NOT IN (SELECT MEMBER_ID FROM MEMBER);
+UPDATE WORKOUT_PLAN SET Trainer_id=NULL WHERE Trainer_id NOT IN (SELECT TRAINER_ID FROM TRAINER);
+UPDATE DIET_PLAN SET Trainer_id=NULL WHERE Trainer_id NOT IN (SELECT TRAINER_ID FROM TRAINER);
+UPDATE MEMBERSHIP SET Member_id=NULL WHERE Member_id NOT IN (SELECT MEMBER_ID FROM MEMBER);
+UPDATE MEMBERSHIP SET Trainer_id=NULL WHERE Trainer_id NOT IN (SELECT TRAINER_ID FROM TRAINER);
+UPDATE MEMBERSHIP SET Plan_id=NULL WHERE Plan_id NOT IN (SELECT Plan_ID FROM WORKOUT_PLAN);
+UPDATE MEMBERSHIP SET DietPlan_id=NULL WHERE DietPlan_id NOT IN (SELECT DietPlan_id FROM DIET_PLAN);
+UPDATE MEMBER_VITALS SET MEMB_ID=NULL WHERE MEMB_ID NOT IN (SELECT MEMBER_ID FROM MEMBER);
+'''
+
+
+def add_foreign_key_actions(conn):
+    # SQLite cannot alter constraints, so each table is copied into a new
+    # definition and swapped in (foreign keys are off while migrating).
+    # AUTOINCREMENT counters are carried over so deleted ids stay retired.
+    run_script(conn, ORPHAN_CLEANUP)
+    sequences = dict(conn.execute('SELECT name, seq FROM sqlite_sequence'))
+    for table, columns in FOREIGN_KEY_TABLES.items():
+        conn.execute(f'CREATE TABLE {table}_new ({columns}\n)')
+        conn.execute(f'INSERT INTO {table}_new SELECT * FROM {table}')
+        conn.execute(f'DROP TABLE {table}')
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+        if table in sequences:
+            conn.execute('DELETE FROM sqlite_sequence WHERE name=?', (table,))
+            conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)',
+                         (table, sequences[table]))
+    problems = conn.execute('PRAGMA foreign_key_check').fetchall()
+    if problems:
+        raise sqlite3.IntegrityError(f'Foreign key violations after rebuild: {problems[:5]}')
+
+
+FOREIGN_KEY_INDEXES = '''
+CREATE INDEX IF NOT EXISTS idx_membership_member ON MEMBERSHIP (Member_id);
+CREATE INDEX IF NOT EXISTS idx_membership_trainer ON MEMBERSHIP (Trainer_id);
+CREATE INDEX IF NOT EXISTS idx_membership_plan ON MEMBERSHIP (Plan_id);
+CREATE INDEX IF NOT EXISTS idx_membership_dietplan ON MEMBERSHIP (DietPlan_id);
+CREATE INDEX IF NOT EXISTS idx_membership_status_end ON MEMBERSHIP (Status, End_date);
+CREATE INDEX IF NOT EXISTS idx_vitals_member_date ON MEMBER_VITALS (MEMB_ID, RECORD_DATE);
+CREATE INDEX IF NOT EXISTS idx_workout_trainer ON WORKOUT_PLAN (Trainer_id);
+CREATE INDEX IF NOT EXISTS idx_diet_trainer ON DIET_PLAN (Trainer_id);
+'''
+
+def keep_archived_history(conn):
+    # The summary and rollup delete triggers gain a WHEN clause that skips
+    # rows backup.archive() moves out, so archiving keeps their history
+    conn.execute(backup.ARCHIVING_TABLE)
+    conn.execute('DROP TRIGGER IF EXISTS stats_membership_delete')
+    conn.execute('DROP TRIGGER IF EXISTS vitals_rollup_delete')
+    run_script(conn, stats.TRIGGERS)
+    run_script(conn, analytics.TRIGGERS)
+    # Rows archived before this took their history with them; put it back
+    if backup.has_archive(conn):
+        stats.rebuild_stats(conn)
+        analytics.rebuild_rollups(conn)
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', BASELINE),
+    (2, 'foreign key ON DELETE actions', add_foreign_key_actions),
+    (3, 'foreign key and filter indexes', FOREIGN_KEY_INDEXES),
+    (4, 'dashboard summary tables', stats.install),
+    (5, 'member vitals rollups', analytics.install),
+    (6, 'full-text search indexes', search.install),
+    (7, 'table versions for the response cache', cache.install),
+    (8, 'archived rows keep their stats and rollups', keep_archived_history),
+]
+
+
+def current_version(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS SCHEMA_VERSION (
+        version INTEGER PRIMARY KEY,
+        name TEXT,
+        applied_at TEXT
+    )''')
+    conn.commit()
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM SCHEMA_VERSION').fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations in order and return the versions applied."""
+    version = current_version(conn)
+    pending = [m for m in MIGRATIONS
+               if m[0] > version and (target is None or m[0] <= target)]
+    if not pending:
+        return []
+
+    # Table rebuilds need foreign keys off, which only works outside a transaction
+    conn.execute('PRAGMA foreign_keys=OFF')
+    applied = []
+    try:
+        for number, name, step in pending:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if callable(step):
+                    step(conn)
+                else:
+                    run_script(conn, step)
+                conn.execute('INSERT INTO SCHEMA_VERSION (version, name, applied_at) VALUES (?, ?, ?)',
+                             (number, name, datetime.now().isoformat(timespec='seconds')))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(number)
+    finally:
+        conn.execute('PRAGMA foreign_keys=ON')
+    return applied
+
+
+if __name__ == '__main__':
+    import db
+    conn = db.connect(sys.argv[1] if len(sys.argv) > 1 else db.DEFAULTS['DATABASE'])
+    applied = migrate(conn)
+    conn.close()
+    print(f'Applied migrations: {applied}' if applied else 'Schema is up to date')
@@ -0,0 +1,75 @@
+import json
+
+# Member profiles: the member row, phone numbers, memberships with resolved
+# trainer and plan names and the latest vitals, for any number of members
+# in four indexed queries (ids are passed as one JSON array).
+
+MAX_IDS = 100
+MAX_VITALS = 100
+
+
+def load_profiles(c, ids, vitals_limit=10):
+    # The four queries share one read snapshot, so a member deleted between
+    # them cannot leave phones or vitals behind without their profile
+    conn = c.connection
+    own = not conn.in_transaction
+    if own:
+        c.execute('BEGIN')
+    try:
+        return _load_profiles(c, ids, vitals_limit)
+    finally:
+        if own:
+            conn.rollback()
+
+
+def _load_profiles(c, ids, vitals_limit):
+    # Each id once, or the per-member vitals join would repeat readings
+    ids_json = json.dumps(list(dict.fromkeys(ids)))
+    profiles = {}
+    for m in c.execute('''SELECT MEMBER_ID, NAME, DOB, JOIN_DATE, EMAIL FROM MEMBER
+                          WHERE MEMBER_ID IN (SELECT value FROM json_each(?))''', (ids_json,)):
+        profiles[m[0]] = {
+            'member_id': m[0], 'name': m[1], 'dob': m[2], 'join_date': m[3], 'email': m[4],
+            'phones': [], 'memberships': [], 'vitals': []
+        }
+    if not profiles:
+        return []
+
+    for member_id, phone in c.execute(
+            '''SELECT MEMBER_ID, PHONE_NUMBER FROM MEMBER_PHONE
+               WHERE MEMBER_ID IN (SELECT value FROM json_each(?))
+               ORDER BY MEMBER_ID, PHONE_NUMBER''', (ids_json,)):
+        profiles[member_id]['phones'].append(phone)
+
+    for m in c.execute(
+            '''SELECT m.Membership_id, m.Membership_type, m.Start_date, m.End_date,
+                      m.Payment_type, m.Payment_amount, m.Status, m.Member_id,
+                      m.Trainer_id, t.NAME, m.Plan_id, w.Plan_name, m.DietPlan_id, d.DietPlan_name
+               FROM MEMBERSHIP m
+               LEFT JOIN TRAINER t ON m.Trainer_id = t.TRAINER_ID
+               LEFT JOIN WORKOUT_PLAN w ON m.Plan_id = w.Plan_ID
+               LEFT JOIN DIET_PLAN d ON m.DietPlan_id = d.DietPlan_id
+               WHERE m.Member_id IN (SELECT value FROM json_each(?))
+               ORDER BY m.Member_id, m.Start_date DESC, m.Membership_id DESC''', (ids_json,)):
+        profiles[m[7]]['memberships'].append({
+            'membership_id': m[0], 'membership_type': m[1], 'start_date': m[2],
+            'end_date': m[3], 'payment_type': m[4], 'payment_amount': m[5], 'status': m[6],
+            'trainer_id': m[8], 'trainer_name': m[9], 'plan_id': m[10], 'plan_name': m[11],
+            'dietplan_id': m[12], 'dietplan_name': m[13]
+        })
+
+    # Latest readings per member, each walked backwards on (MEMB_ID, RECORD_DATE)
+    for v in c.execute(
+            '''SELECT v.VITALS_ID, v.WEIGHT, v.HEIGHT, v.RECORD_DATE, v.MEMB_ID
+               FROM json_each(?) j
+               JOIN MEMBER_VITALS v ON v.VITALS_ID IN (
+                   SELECT VITALS_ID FROM MEMBER_VITALS WHERE MEMB_ID = j.value
+                   ORDER BY RECORD_DATE DESC, VITALS_ID DESC LIMIT ?)
+               ORDER BY v.MEMB_ID, v.RECORD_DATE DESC, v.VITALS_ID DESC''',
+            (ids_json, max(0, min(vitals_limit, MAX_VITALS)))):
+        profiles[v[4]]['vitals'].append({
+            'vitals_id': v[0], 'weight': v[1], 'height': v[2], 'record_date': v[3]
+        })
+
+    # Requested order, skipping unknown ids
+    return [profiles[i] for i in dict.fromkeys(ids) if i in profiles]
@@ -0,0 +1,77 @@
+import re
+
+from db import run_script
+
+# Full-text search over members, trainers and plans. Each source table has
+# an external-content FTS5 index (the text is read back from the source
+# table by rowid, not stored twice) kept in sync by triggers, so every
+# insert, update and delete handler updates it in the same transaction.
+
+# kind: (FTS table, source table, id column, indexed columns, column weights)
+INDEXES = {
+    'members': ('MEMBER_FTS', 'MEMBER', 'MEMBER_ID', ('NAME', 'EMAIL'), (10.0, 2.0)),
+    'trainers': ('TRAINER_FTS', 'TRAINER', 'TRAINER_ID', ('NAME', 'SPECIALISATION'), (10.0, 5.0)),
+    'workouts': ('WORKOUT_FTS', 'WORKOUT_PLAN', 'Plan_ID', ('Plan_name', 'Description'), (10.0, 1.0)),
+    'diets': ('DIET_FTS', 'DIET_PLAN', 'DietPlan_id', ('DietPlan_name', 'Diet_Description'), (10.0, 1.0)),
+}
+
+MAX_RESULTS = 100
+
+
+def index_sql(fts, table, key, columns):
+    cols = ', '.join(columns)
+    new = ', '.join(f'NEW.{c}' for c in columns)
+    old = ', '.join(f'OLD.{c}' for c in columns)
+    name = fts.lower()
+    # Prefix indexes make typeahead queries ("ann*") index lookups
+    return f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+    {cols}, content='{table}', content_rowid='{key}',
+    prefix='2 3 4', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} BEGIN
+    INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.{key}, {new});
+END;
+CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} BEGIN
+    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.{key}, {old});
+END;
+CREATE TRIGGER IF NOT EXISTS {name}_update AFTER UPDATE ON {table} BEGIN
+    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', OLD.{key}, {old});
+    INSERT INTO {fts} (rowid, {cols}) VALUES (NEW.{key}, {new});
+END;
+INSERT INTO {fts} ({fts}) VALUES ('rebuild');
+'''
+
+
+def install(conn):
+    for fts, table, key, columns, _ in INDEXES.values():
+        run_script(conn, index_sql(fts, table, key, columns))
+
+
+def match_query(text):
+    # Every word must match, the last one as a prefix for typeahead; words
+    # are quoted so user input can never be parsed as FTS5 query syntax
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return ' '.join(terms)
+
+
+def search(c, text, kinds=None, limit=20, offset=0):
+    query = match_query(text)
+    if query is None:
+        return []
+    parts, params = [], []
+    for kind in kinds or INDEXES:
+        fts, _, _, columns, weights = INDEXES[kind]
+        parts.append(f'''SELECT '{kind}', rowid, {columns[0]}, {columns[1]},
+                                bm25({fts}, {', '.join(map(str, weights))})
+                         FROM {fts} WHERE {fts} MATCH ?''')
+        params.append(query)
+    rows = c.execute(' UNION ALL '.join(parts) + ' ORDER BY 5 LIMIT ? OFFSET ?',
+                     params + [min(limit, MAX_RESULTS), offset])
+    # bm25 is lower for better matches; flip it so higher scores rank first
+    return [{
+        'type': r[0], 'id': r[1], 'title': r[2], 'detail': r[3], 'score': -r[4]
+    } for r in rows]
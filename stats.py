@@ -0,0 +1,239 @@
+import backup
+from db import run_script
+
+# Dashboard summary tables. Triggers on MEMBER, TRAINER and MEMBERSHIP keep
+# them current inside the same transaction as every write, including the
+# rows changed by ON DELETE actions, so GET /api/stats never scans the
+# base tables. rebuild_stats() recomputes everything from scratch.
+# Memberships moved to the archive database keep counting (see
+# backup.archive), so a rebuild reads them too when an archive is attached.
+
+SUMMARY_TABLES = '''
+CREATE TABLE IF NOT EXISTS STATS_COUNTS (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS STATS_MEMBERSHIP_STATUS (
+    Membership_type TEXT NOT NULL,
+    Status TEXT NOT NULL,
+    memberships INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Membership_type, Status)
+);
+
+CREATE TABLE IF NOT EXISTS STATS_REVENUE (
+    Payment_type TEXT NOT NULL,
+    Month TEXT NOT NULL,
+    revenue REAL NOT NULL DEFAULT 0,
+    memberships INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Payment_type, Month)
+);
+
+CREATE TABLE IF NOT EXISTS STATS_TRAINER_MEMBER (
+    Trainer_id INTEGER NOT NULL,
+    Member_id INTEGER NOT NULL,
+    memberships INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (Trainer_id, Member_id)
+);
+
+CREATE TABLE IF NOT EXISTS STATS_TRAINER (
+    Trainer_id INTEGER PRIMARY KEY,
+    members INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS STATS_PLAN_USAGE (
+    kind TEXT NOT NULL,
+    Plan_id INTEGER NOT NULL,
+    memberships INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (kind, Plan_id)
+);
+'''
+
+
+def count(name, sign):
+    return f'''
+    INSERT INTO STATS_COUNTS (name, value) VALUES ('{name}', {sign})
+        ON CONFLICT (name) DO UPDATE SET value = value + excluded.value;'''
+
+
+def membership_delta(row, sign):
+    # Adds (sign=1) or removes (sign=-1) one MEMBERSHIP row from the
+    # summaries. NULL grouping columns are stored as '' so upserts match.
+    return f'''
+    INSERT INTO STATS_MEMBERSHIP_STATUS (Membership_type, Status, memberships)
+        VALUES (COALESCE({row}.Membership_type, ''), COALESCE({row}.Status, ''), {sign})
+        ON CONFLICT (Membership_type, Status) DO UPDATE SET memberships = memberships + excluded.memberships;
+    INSERT INTO STATS_REVENUE (Payment_type, Month, revenue, memberships)
+        VALUES (COALESCE({row}.Payment_type, ''), COALESCE(substr({row}.Start_date, 1, 7), ''),
+                {sign} * COALESCE({row}.Payment_amount, 0), {sign})
+        ON CONFLICT (Payment_type, Month) DO UPDATE SET revenue = revenue + excluded.revenue,
+                                                        memberships = memberships + excluded.memberships;
+    INSERT INTO STATS_TRAINER_MEMBER (Trainer_id, Member_id, memberships)
+        SELECT {row}.Trainer_id, {row}.Member_id, {sign}
+        WHERE {row}.Trainer_id IS NOT NULL AND {row}.Member_id IS NOT NULL
+        ON CONFLICT (Trainer_id, Member_id) DO UPDATE SET memberships = memberships + excluded.memberships;
+    DELETE FROM STATS_TRAINER_MEMBER
+        WHERE Trainer_id = {row}.Trainer_id AND Member_id = {row}.Member_id AND memberships <= 0;
+    INSERT INTO STATS_PLAN_USAGE (kind, Plan_id, memberships)
+        SELECT 'workout', {row}.Plan_id, {sign} WHERE {row}.Plan_id IS NOT NULL
+        ON CONFLICT (kind, Plan_id) DO UPDATE SET memberships = memberships + excluded.memberships;
+    INSERT INTO STATS_PLAN_USAGE (kind, Plan_id, memberships)
+        SELECT 'diet', {row}.DietPlan_id, {sign} WHERE {row}.DietPlan_id IS NOT NULL
+        ON CONFLICT (kind, Plan_id) DO UPDATE SET memberships = memberships + excluded.memberships;'''
+
+
+TRIGGERS = f'''
+CREATE TRIGGER IF NOT EXISTS stats_member_insert AFTER INSERT ON MEMBER BEGIN{count('members', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_member_delete AFTER DELETE ON MEMBER BEGIN{count('members', -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_trainer_insert AFTER INSERT ON TRAINER BEGIN{count('trainers', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_trainer_delete AFTER DELETE ON TRAINER BEGIN{count('trainers', -1)}
+    DELETE FROM STATS_TRAINER WHERE Trainer_id = OLD.TRAINER_ID;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_workout_delete AFTER DELETE ON WORKOUT_PLAN BEGIN
+    DELETE FROM STATS_PLAN_USAGE WHERE kind = 'workout' AND Plan_id = OLD.Plan_ID;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_diet_delete AFTER DELETE ON DIET_PLAN BEGIN
+    DELETE FROM STATS_PLAN_USAGE WHERE kind = 'diet' AND Plan_id = OLD.DietPlan_id;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_membership_insert AFTER INSERT ON MEMBERSHIP BEGIN{count('memberships', 1)}{membership_delta('NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_membership_delete AFTER DELETE ON MEMBERSHIP
+    WHEN {backup.NOT_ARCHIVING} BEGIN{count('memberships', -1)}{membership_delta('OLD', -1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_membership_update AFTER UPDATE ON MEMBERSHIP BEGIN{membership_delta('OLD', -1)}{membership_delta('NEW', 1)}
+END;
+CREATE TRIGGER IF NOT EXISTS stats_trainer_member_insert AFTER INSERT ON STATS_TRAINER_MEMBER BEGIN
+    INSERT INTO STATS_TRAINER (Trainer_id, members) VALUES (NEW.Trainer_id, 1)
+        ON CONFLICT (Trainer_id) DO UPDATE SET members = members + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_trainer_member_delete AFTER DELETE ON STATS_TRAINER_MEMBER BEGIN
+    UPDATE STATS_TRAINER SET members = members - 1 WHERE Trainer_id = OLD.Trainer_id;
+END;
+'''
+
+REBUILD = '''
+DELETE FROM STATS_COUNTS;
+DELETE FROM STATS_MEMBERSHIP_STATUS;
+DELETE FROM STATS_REVENUE;
+DELETE FROM STATS_TRAINER_MEMBER;
+DELETE FROM STATS_TRAINER;
+DELETE FROM STATS_PLAN_USAGE;
+INSERT INTO STATS_COUNTS (name, value)
+    SELECT 'members', COUNT(*) FROM MEMBER
+    UNION ALL SELECT 'trainers', COUNT(*) FROM TRAINER
+    UNION ALL SELECT 'memberships', COUNT(*) FROM {memberships};
+INSERT INTO STATS_MEMBERSHIP_STATUS (Membership_type, Status, memberships)
+    SELECT COALESCE(Membership_type, ''), COALESCE(Status, ''), COUNT(*)
+    FROM {memberships} GROUP BY 1, 2;
+INSERT INTO STATS_REVENUE (Payment_type, Month, revenue, memberships)
+    SELECT COALESCE(Payment_type, ''), COALESCE(substr(Start_date, 1, 7), ''),
+           SUM(COALESCE(Payment_amount, 0)), COUNT(*)
+    FROM {memberships} GROUP BY 1, 2;
+INSERT INTO STATS_TRAINER_MEMBER (Trainer_id, Member_id, memberships)
+    SELECT Trainer_id, Member_id, COUNT(*) FROM {memberships}
+    WHERE Trainer_id IS NOT NULL AND Member_id IS NOT NULL GROUP BY 1, 2;
+INSERT INTO STATS_PLAN_USAGE (kind, Plan_id, memberships)
+    SELECT 'workout', Plan_id, COUNT(*) FROM {memberships} WHERE Plan_id IS NOT NULL GROUP BY 2
+    UNION ALL
+    SELECT 'diet', DietPlan_id, COUNT(*) FROM {memberships} WHERE DietPlan_id IS NOT NULL GROUP BY 2;
+'''
+
+
+def forget_memberships(c, rows, params=()):
+    """Take memberships out of the summaries without their triggers firing.
+
+    `rows` is a query returning MEMBERSHIP rows, such as archived ones whose
+    member is being deleted; `params` are bound to each use of it.
+    """
+    statements = [
+        f"""UPDATE STATS_COUNTS SET value = value - (SELECT COUNT(*) FROM ({rows}))
+            WHERE name = 'memberships'""",
+        f'''UPDATE STATS_MEMBERSHIP_STATUS AS s SET memberships = s.memberships - d.n
+            FROM (SELECT COALESCE(Membership_type, '') AS type, COALESCE(Status, '') AS status, COUNT(*) AS n
+                  FROM ({rows}) GROUP BY 1, 2) d
+            WHERE s.Membership_type = d.type AND s.Status = d.status''',
+        f'''UPDATE STATS_REVENUE AS s SET revenue = s.revenue - d.revenue, memberships = s.memberships - d.n
+            FROM (SELECT COALESCE(Payment_type, '') AS payment, COALESCE(substr(Start_date, 1, 7), '') AS month,
+                         SUM(COALESCE(Payment_amount, 0)) AS revenue, COUNT(*) AS n
+                  FROM ({rows}) GROUP BY 1, 2) d
+            WHERE s.Payment_type = d.payment AND s.Month = d.month''',
+        f'''UPDATE STATS_TRAINER_MEMBER AS s SET memberships = s.memberships - d.n
+            FROM (SELECT Trainer_id, Member_id, COUNT(*) AS n FROM ({rows}) GROUP BY 1, 2) d
+            WHERE s.Trainer_id = d.Trainer_id AND s.Member_id = d.Member_id''',
+        f'''UPDATE STATS_PLAN_USAGE AS s SET memberships = s.memberships - d.n
+            FROM (SELECT Plan_id, COUNT(*) AS n FROM ({rows}) GROUP BY 1) d
+            WHERE s.kind = 'workout' AND s.Plan_id = d.Plan_id''',
+        f'''UPDATE STATS_PLAN_USAGE AS s SET memberships = s.memberships - d.n
+            FROM (SELECT DietPlan_id, COUNT(*) AS n FROM ({rows}) GROUP BY 1) d
+            WHERE s.kind = 'diet' AND s.Plan_id = d.DietPlan_id''',
+    ]
+    for sql in statements:
+        c.execute(sql, tuple(params))
+    # Fires the STATS_TRAINER_MEMBER delete trigger, as the row triggers do
+    c.execute('DELETE FROM STATS_TRAINER_MEMBER WHERE memberships <= 0')
+
+
+# Archived copies of rows that are still live (left by an interrupted
+# archive run) are counted once
+ARCHIVED_MEMBERSHIPS = '''(SELECT * FROM main.MEMBERSHIP UNION ALL
+    SELECT * FROM archive.MEMBERSHIP WHERE Membership_id NOT IN (SELECT Membership_id FROM main.MEMBERSHIP))'''
+
+
+def rebuild_stats(conn):
+    # STATS_TRAINER is filled by the STATS_TRAINER_MEMBER insert trigger
+    memberships = ARCHIVED_MEMBERSHIPS if backup.has_archive(conn) else 'MEMBERSHIP'
+    run_script(conn, REBUILD.format(memberships=memberships))
+
+
+def install(conn):
+    conn.execute(backup.ARCHIVING_TABLE)
+    run_script(conn, SUMMARY_TABLES)
+    run_script(conn, TRIGGERS)
+    rebuild_stats(conn)
+
+
+def read_stats(c):
+    counts = dict(c.execute('SELECT name, value FROM STATS_COUNTS'))
+    return {
+        'members': counts.get('members', 0),
+        'trainers': counts.get('trainers', 0),
+        'memberships': counts.get('memberships', 0),
+        'active_memberships_by_type': [
+            {'membership_type': r[0], 'memberships': r[1]} for r in c.execute(
+                '''SELECT Membership_type, memberships FROM STATS_MEMBERSHIP_STATUS
+                   WHERE Status = 'Active' AND memberships > 0 ORDER BY Membership_type''')
+        ],
+        'memberships_by_status': [
+            {'membership_type': r[0], 'status': r[1], 'memberships': r[2]} for r in c.execute(
+                '''SELECT Membership_type, Status, memberships FROM STATS_MEMBERSHIP_STATUS
+                   WHERE memberships > 0 ORDER BY Membership_type, Status''')
+        ],
+        'revenue': [
+            {'payment_type': r[0], 'month': r[1], 'revenue': r[2], 'memberships': r[3]} for r in c.execute(
+                '''SELECT Payment_type, Month, revenue, memberships FROM STATS_REVENUE
+                   WHERE memberships > 0 ORDER BY Month, Payment_type''')
+        ],
+        'members_per_trainer': [
+            {'trainer_id': r[0], 'trainer_name': r[1], 'members': r[2]} for r in c.execute(
+                '''SELECT t.TRAINER_ID, t.NAME, COALESCE(s.members, 0)
+                   FROM TRAINER t LEFT JOIN STATS_TRAINER s ON s.Trainer_id = t.TRAINER_ID
+                   ORDER BY t.TRAINER_ID''')
+        ],
+        'workout_plan_usage': [
+            {'plan_id': r[0], 'plan_name': r[1], 'memberships': r[2]} for r in c.execute(
+                '''SELECT w.Plan_ID, w.Plan_name, COALESCE(s.memberships, 0)
+                   FROM WORKOUT_PLAN w
+                   LEFT JOIN STATS_PLAN_USAGE s ON s.kind = 'workout' AND s.Plan_id = w.Plan_ID
+                   ORDER BY w.Plan_ID''')
+        ],
+        'diet_plan_usage': [
+            {'dietplan_id': r[0], 'dietplan_name': r[1], 'memberships': r[2]} for r in c.execute(
+                '''SELECT d.DietPlan_id, d.DietPlan_name, COALESCE(s.memberships, 0)
+                   FROM DIET_PLAN d
+                   LEFT JOIN STATS_PLAN_USAGE s ON s.kind = 'diet' AND s.Plan_id = d.DietPlan_id
+                   ORDER BY d.DietPlan_id''')
+        ],
+    }
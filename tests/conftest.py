@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A connection to a new, fully migrated database."""
+    conn = db.connect(str(tmp_path / 'test.db'))
+    migrations.migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def client(tmp_path):
+    """A test client for the app, serving a new migrated database."""
+    import cache
+    from app import app, init_db
+
+    app.config['DATABASE'] = str(tmp_path / 'app.db')
+    init_db()
+    yield app.test_client()
+    # Pool and response cache are per app; start the next test afresh
+    pool = app.extensions.pop('fitness_db', None)
+    if pool is not None:
+        pool.close()
+    cache.init_app(app)
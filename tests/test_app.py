@@ -0,0 +1,12 @@
+def test_list_rejects_invalid_paging(client):
+    for i in range(3):
+        client.post('/api/trainers', json={'name': f'Trainer {i}', 'specialisation': 'Yoga'})
+
+    for query in ('limit=abc', 'after=abc', 'limit=', 'limit=2&after=x'):
+        response = client.get(f'/api/trainers?{query}')
+        assert response.status_code == 400, query
+
+    response = client.get('/api/trainers?limit=2')
+    assert [t['trainer_id'] for t in response.get_json()] == [1, 2]
+    assert response.headers['X-Next-After'] == '2'
+    assert [t['trainer_id'] for t in client.get('/api/trainers?after=2&limit=2').get_json()] == [3]
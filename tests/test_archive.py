@@ -0,0 +1,80 @@
+import analytics
+import backup
+import stats
+from app import remove_members
+
+SEED = '''
+INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES ('Maya Iyer', 'Strength');
+INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES
+    ('Ana Costa', '1990-02-01', '2020-01-01', 'ana@example.com'),
+    ('Ben Das', '1985-07-12', '2020-01-15', 'ben@example.com');
+INSERT INTO WORKOUT_PLAN (Plan_name, Description, Intensity_level, Trainer_id)
+    VALUES ('Core Program', 'core work', 'Medium', 1);
+INSERT INTO MEMBERSHIP (Membership_type, Start_date, End_date, Payment_type, Payment_amount, Status,
+                        Member_id, DietPlan_id, Trainer_id, Plan_id) VALUES
+    ('Monthly', '2020-01-01', '2020-01-31', 'Card', 50.0, 'Expired', 1, NULL, 1, 1),
+    ('Yearly', '2020-02-01', '2021-01-31', 'Cash', 500.0, 'Expired', 2, NULL, 1, NULL),
+    ('Yearly', '2024-01-01', '2024-12-31', 'Card', 600.0, 'Active', 1, NULL, 1, 1);
+INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES
+    (70.0, 175.0, '2020-01-06', 1), (71.0, 175.0, '2020-03-02', 1),
+    (72.0, 175.0, '2023-05-01', 1), (72.5, 175.0, '2023-05-20', 1),
+    (80.0, 180.0, '2020-02-10', 2), (79.0, 180.0, '2024-01-08', 2);
+'''
+
+
+def seed(conn, tmp_path):
+    for statement in SEED.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    conn.commit()
+    backup.attach_archive(conn, str(tmp_path / 'archive.db'))
+
+
+def rollups(conn):
+    return sorted(conn.execute('SELECT * FROM VITALS_ROLLUP'))
+
+
+def test_archiving_keeps_stats_and_rollups(conn, tmp_path):
+    seed(conn, tmp_path)
+    dashboard, buckets = stats.read_stats(conn.cursor()), rollups(conn)
+
+    moved = backup.archive(conn, str(tmp_path / 'archive.db'), vitals_before='2023-05-15',
+                           memberships_ended_before='2022-01-01')
+    # Vitals stop at the start of the cutoff's month, so May 2023 stays live
+    assert moved == {'MEMBER_VITALS': 3, 'MEMBERSHIP': 2}
+    assert [r[0] for r in conn.execute('SELECT RECORD_DATE FROM MEMBER_VITALS ORDER BY 1')] == [
+        '2023-05-01', '2023-05-20', '2024-01-08']
+
+    assert stats.read_stats(conn.cursor()) == dashboard
+    assert rollups(conn) == buckets
+
+    # A rebuild counts the archived rows as well
+    stats.rebuild_stats(conn)
+    analytics.rebuild_rollups(conn)
+    conn.commit()
+    assert stats.read_stats(conn.cursor()) == dashboard
+    assert rollups(conn) == buckets
+    assert conn.execute('SELECT COUNT(*) FROM ARCHIVING').fetchone()[0] == 0
+
+
+def test_deleting_a_member_removes_their_archived_rows(conn, tmp_path):
+    seed(conn, tmp_path)
+    backup.archive(conn, str(tmp_path / 'archive.db'), vitals_before='2023-05-15',
+                   memberships_ended_before='2022-01-01')
+    remove_members(conn.cursor(), [1])
+    conn.commit()
+
+    assert conn.execute('SELECT COUNT(*) FROM archive.MEMBERSHIP WHERE Member_id = 1').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM archive.MEMBER_VITALS WHERE MEMB_ID = 1').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM archive.MEMBERSHIP').fetchone()[0] == 1
+    assert conn.execute('SELECT COUNT(*) FROM archive.MEMBER_VITALS').fetchone()[0] == 1
+
+    # The member's archived memberships leave the stats as the live ones do
+    dashboard, buckets = stats.read_stats(conn.cursor()), rollups(conn)
+    assert dashboard['memberships'] == 1
+    assert [r['revenue'] for r in dashboard['revenue']] == [500.0]
+    stats.rebuild_stats(conn)
+    analytics.rebuild_rollups(conn)
+    conn.commit()
+    assert stats.read_stats(conn.cursor()) == dashboard
+    assert rollups(conn) == buckets
@@ -0,0 +1,26 @@
+import bulk
+
+
+def test_malformed_ndjson_line_fails_alone():
+    lines = [bulk.Line('{"name": "Maya Iyer", "specialisation": "Strength"}\n'),
+             bulk.Line('{"name": "Noah\n'),
+             bulk.Line('{"name": "Olga Novak"}\n'),
+             bulk.Line('{"name": "Uma Singh", "specialisation": "Yoga"}\n')]
+    results, pending = bulk.prepare('trainers', lines)
+    assert results == [None, {'index': 1, 'error': 'Invalid JSON'},
+                       {'index': 2, 'error': 'Missing field: specialisation'}, None]
+    assert pending == [(0, ['Maya Iyer', 'Strength']), (3, ['Uma Singh', 'Yoga'])]
+
+
+def test_unknown_references_are_rejected_per_row(conn):
+    conn.execute("INSERT INTO MEMBER (NAME) VALUES ('Ana Costa')")
+    conn.commit()
+    rows = [{'weight': 70, 'height': 175, 'record_date': '2024-01-01', 'memb_id': 1},
+            {'weight': 71, 'height': 175, 'record_date': '2024-01-02', 'memb_id': 7},
+            {'weight': 72, 'height': 175, 'record_date': '2024-01-03', 'memb_id': 1}]
+    results, pending = bulk.prepare('vitals', rows)
+    assert bulk.insert_rows(conn.cursor(), 'vitals', pending, results) == 2
+    conn.commit()
+    assert results == [{'index': 0, 'id': 1}, {'index': 1, 'error': 'Unknown memb_id: 7'},
+                       {'index': 2, 'id': 2}]
+    assert conn.execute('SELECT COUNT(*) FROM MEMBER_VITALS').fetchone()[0] == 2
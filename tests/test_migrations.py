@@ -0,0 +1,113 @@
+import sqlite3
+
+import db
+import migrations
+
+# A database as the code before migrations left it: the baseline schema
+# without SCHEMA_VERSION, references that point nowhere, and retired ids
+# whose AUTOINCREMENT counters must survive the table rebuilds
+LEGACY_ROWS = '''
+INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES
+    ('Ana Costa', '1990-02-01', '2023-01-10', 'ana@example.com'),
+    ('Ben Das', '1985-07-12', '2023-03-05', 'ben@example.com'),
+    ('Chen Wang', '1999-11-30', '2023-04-20', 'chen@example.com');
+DELETE FROM MEMBER WHERE MEMBER_ID = 3;
+
+INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES ('Maya Iyer', 'Strength'), ('Noah Lopez', 'Yoga');
+
+INSERT INTO WORKOUT_PLAN (Plan_name, Description, Intensity_level, Trainer_id) VALUES
+    ('Core Program', '3 sessions a week', 'Medium', 1),
+    ('Lost Program', 'trainer long gone', 'High', 9);
+INSERT INTO DIET_PLAN (DietPlan_name, Diet_Description, Target_Calories, Trainer_id) VALUES
+    ('Keto Plan', 'low carb meals', 1800, 2),
+    ('Vegan Plan', 'plant meals', 2200, 7);
+
+INSERT INTO MEMBER_PHONE (MEMBER_ID, PHONE_NUMBER) VALUES (1, '+15550001'), (2, '+15550002'), (8, '+15550008');
+
+INSERT INTO MEMBERSHIP (Membership_type, Start_date, End_date, Payment_type, Payment_amount, Status,
+                        Member_id, DietPlan_id, Trainer_id, Plan_id) VALUES
+    ('Monthly', '2024-01-01', '2024-01-31', 'Card', 1500.0, 'Expired', 1, 1, 1, 1),
+    ('Yearly', '2024-02-01', '2025-02-01', 'Cash', 14000.0, 'Active', 2, 2, 2, 2),
+    ('Monthly', '2024-03-01', '2024-03-31', 'UPI', 1500.0, 'Expired', 8, 5, 6, 7),
+    ('Quarterly', '2024-04-01', '2024-06-30', 'Card', 4000.0, 'Expired', 1, NULL, 2, NULL);
+DELETE FROM MEMBERSHIP WHERE Membership_id = 4;
+
+INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES
+    (70.5, 175.0, '2024-01-01', 1),
+    (82.0, 180.0, '2024-01-02', 2),
+    (61.0, 160.0, '2024-01-03', 9);
+'''
+
+TABLES = ('MEMBER', 'MEMBER_PHONE', 'TRAINER', 'WORKOUT_PLAN', 'DIET_PLAN', 'MEMBERSHIP', 'MEMBER_VITALS')
+
+
+def rows(conn, table):
+    return conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall()
+
+
+def legacy_database(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(migrations.BASELINE + LEGACY_ROWS)
+    before = {table: rows(conn, table) for table in TABLES}
+    sequences = dict(conn.execute('SELECT name, seq FROM sqlite_sequence'))
+    conn.close()
+    return before, sequences
+
+
+def test_migrating_legacy_database_keeps_rows_and_clears_orphans(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    before, sequences = legacy_database(path)
+
+    conn = db.connect(path)
+    applied = migrations.migrate(conn)
+    assert applied == [m[0] for m in migrations.MIGRATIONS]
+    assert migrations.migrate(conn) == []
+    assert conn.execute('PRAGMA foreign_key_check').fetchall() == []
+
+    # Valid rows are copied unchanged
+    for table in ('MEMBER', 'TRAINER'):
+        assert rows(conn, table) == before[table]
+    assert rows(conn, 'MEMBER_PHONE') == [(1, '+15550001'), (2, '+15550002')]
+    assert rows(conn, 'WORKOUT_PLAN') == [
+        (1, 'Core Program', '3 sessions a week', 'Medium', 1),
+        (2, 'Lost Program', 'trainer long gone', 'High', None)]
+    assert rows(conn, 'DIET_PLAN') == [
+        (1, 'Keto Plan', 'low carb meals', 1800, 2),
+        (2, 'Vegan Plan', 'plant meals', 2200, None)]
+    assert rows(conn, 'MEMBERSHIP') == [
+        before['MEMBERSHIP'][0],
+        before['MEMBERSHIP'][1],
+        (3, 'Monthly', '2024-03-01', '2024-03-31', 'UPI', 1500.0, 'Expired', None, None, None, None)]
+    assert rows(conn, 'MEMBER_VITALS') == before['MEMBER_VITALS'][:2] + [(3, 61.0, 160.0, '2024-01-03', None)]
+
+    # Deleted ids stay retired
+    assert dict(conn.execute('SELECT name, seq FROM sqlite_sequence')) == sequences
+    c = conn.cursor()
+    c.execute("INSERT INTO MEMBER (NAME) VALUES ('Dana Evans')")
+    assert c.lastrowid == 4
+    c.execute("INSERT INTO MEMBERSHIP (Membership_type, Member_id) VALUES ('Monthly', 4)")
+    assert c.lastrowid == 5
+    conn.commit()
+    conn.close()
+
+
+def test_migrated_foreign_keys_cascade_and_set_null(tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    legacy_database(path)
+    conn = db.connect(path)
+    migrations.migrate(conn)
+
+    conn.execute('DELETE FROM MEMBER WHERE MEMBER_ID = 1')
+    conn.execute('DELETE FROM TRAINER WHERE TRAINER_ID = 2')
+    conn.execute('DELETE FROM WORKOUT_PLAN WHERE Plan_ID = 2')
+    conn.commit()
+
+    # The member's phones, memberships and vitals go with it
+    assert conn.execute('SELECT COUNT(*) FROM MEMBER_PHONE WHERE MEMBER_ID = 1').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM MEMBERSHIP WHERE Member_id = 1').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM MEMBER_VITALS WHERE MEMB_ID = 1').fetchone()[0] == 0
+    # Deleting a trainer or plan only clears the references to it
+    assert conn.execute('SELECT Trainer_id, Plan_id FROM MEMBERSHIP WHERE Membership_id = 2').fetchone() == (None, None)
+    assert conn.execute('SELECT Trainer_id FROM DIET_PLAN WHERE DietPlan_id = 1').fetchone() == (None,)
+    assert conn.execute('SELECT COUNT(*) FROM MEMBER_VITALS WHERE MEMB_ID = 2').fetchone()[0] == 1
+    conn.close()
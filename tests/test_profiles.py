@@ -0,0 +1,38 @@
+import profiles
+
+SEED = '''
+INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES
+    ('Ana Costa', '1990-02-01', '2024-01-10', 'ana@example.com'),
+    ('Ben Das', '1985-07-12', '2024-01-15', 'ben@example.com');
+INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES
+    (70.0, 175.0, '2024-01-01', 1), (70.5, 175.0, '2024-02-01', 1),
+    (71.0, 175.0, '2024-02-01', 1), (82.0, 180.0, '2024-01-02', 2);
+'''
+
+
+def seed(conn):
+    for statement in SEED.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    conn.commit()
+
+
+def vitals_ids(profile):
+    return [v['vitals_id'] for v in profile['vitals']]
+
+
+def test_repeated_ids_return_each_profile_once(conn):
+    seed(conn)
+    found = profiles.load_profiles(conn.cursor(), [2, 1, 2, 1, 99])
+    assert [p['member_id'] for p in found] == [2, 1]
+    assert vitals_ids(found[0]) == [4]
+    assert vitals_ids(found[1]) == [3, 2, 1]
+
+
+def test_vitals_limit_keeps_latest_readings(conn):
+    seed(conn)
+    # Readings on the same day are cut by id, newest first
+    assert vitals_ids(profiles.load_profiles(conn.cursor(), [1, 1], 1)[0]) == [3]
+    assert vitals_ids(profiles.load_profiles(conn.cursor(), [1], 2)[0]) == [3, 2]
+    assert vitals_ids(profiles.load_profiles(conn.cursor(), [1], 0)[0]) == []
+    assert vitals_ids(profiles.load_profiles(conn.cursor(), [1], -5)[0]) == []
@@ -0,0 +1,139 @@
+import analytics
+import search
+import stats
+
+# Trigger-maintained tables must end up exactly where a full rebuild from
+# the base tables would put them, whatever mix of writes got them there.
+# The workload covers inserts, updates that move rows between groups and
+# buckets, and deletes whose ON DELETE CASCADE or SET NULL actions change
+# rows the statement never named.
+
+SEED = '''
+INSERT INTO TRAINER (NAME, SPECIALISATION) VALUES
+    ('Maya Iyer', 'Strength'), ('Noah Lopez', 'Yoga'), ('Olga Novak', 'Cardio');
+INSERT INTO MEMBER (NAME, DOB, JOIN_DATE, EMAIL) VALUES
+    ('Ana Costa', '1990-02-01', '2024-01-10', 'ana@example.com'),
+    ('Ben Das', '1985-07-12', '2024-01-15', 'ben@example.com'),
+    ('Chen Wang', '1999-11-30', '2024-02-01', 'chen@example.com'),
+    ('Diego Rossi', '1978-05-05', '2024-02-20', 'diego@example.com');
+INSERT INTO MEMBER_PHONE (MEMBER_ID, PHONE_NUMBER) VALUES (1, '+15550001'), (2, '+15550002'), (2, '+15550003');
+INSERT INTO WORKOUT_PLAN (Plan_name, Description, Intensity_level, Trainer_id) VALUES
+    ('Core Program', 'core work', 'Medium', 1),
+    ('Endurance Program', 'long runs', 'High', 3),
+    ('Mobility Program', 'stretching', 'Low', 1);
+INSERT INTO DIET_PLAN (DietPlan_name, Diet_Description, Target_Calories, Trainer_id) VALUES
+    ('Keto Plan', 'low carb meals', 1800, 1),
+    ('Vegan Plan', 'plant meals', 2200, 2);
+INSERT INTO MEMBERSHIP (Membership_type, Start_date, End_date, Payment_type, Payment_amount, Status,
+                        Member_id, DietPlan_id, Trainer_id, Plan_id) VALUES
+    ('Monthly', '2024-01-10', '2024-02-09', 'Card', 1500.0, 'Expired', 1, 1, 1, 1),
+    ('Yearly', '2024-02-10', '2025-02-09', 'Card', 14000.0, 'Active', 1, 2, 1, 3),
+    ('Quarterly', '2024-01-15', '2024-04-14', 'Cash', 4000.0, 'Expired', 2, 1, 1, 2),
+    ('Monthly', '2024-04-15', '2024-05-14', 'UPI', 1500.0, 'Active', 2, NULL, 2, 1),
+    ('Monthly', '2024-02-01', '2024-03-02', 'Cash', 1500.0, 'Active', 3, 2, 3, 2),
+    ('Yearly', '2024-02-20', '2025-02-19', 'UPI', 14000.0, 'Active', 4, NULL, NULL, NULL);
+INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES
+    (70.5, 175.0, '2024-01-01', 1), (70.1, 175.0, '2024-01-03', 1), (69.8, 175.0, '2024-01-09', 1),
+    (69.0, 175.0, '2024-02-01', 1), (82.0, 180.0, '2024-01-02', 2), (81.4, 180.0, '2024-01-30', 2),
+    (60.0, 160.0, '2024-01-31', 3), (61.2, 160.0, '2024-02-29', 3), (NULL, 160.0, '2024-03-01', 3),
+    (95.0, 185.0, '2024-03-04', 4);
+'''
+
+WORKLOAD = '''
+UPDATE MEMBERSHIP SET Status = 'Expired' WHERE Membership_id = 5;
+UPDATE MEMBERSHIP SET Membership_type = 'Quarterly', Payment_amount = 4000.0, Start_date = '2024-03-01'
+    WHERE Membership_id = 4;
+UPDATE MEMBERSHIP SET Trainer_id = 3, Member_id = 3 WHERE Membership_id = 1;
+UPDATE MEMBER_VITALS SET RECORD_DATE = '2024-02-12' WHERE VITALS_ID = 2;
+UPDATE MEMBER_VITALS SET WEIGHT = 71.0 WHERE VITALS_ID = 3;
+UPDATE MEMBER_VITALS SET MEMB_ID = 4 WHERE VITALS_ID = 6;
+UPDATE MEMBER SET NAME = 'Chen Li' WHERE MEMBER_ID = 3;
+UPDATE WORKOUT_PLAN SET Description = 'hill sprints' WHERE Plan_ID = 2;
+DELETE FROM MEMBER_VITALS WHERE VITALS_ID = 8;
+DELETE FROM MEMBER WHERE MEMBER_ID = 2;
+DELETE FROM TRAINER WHERE TRAINER_ID = 1;
+DELETE FROM WORKOUT_PLAN WHERE Plan_ID = 2;
+DELETE FROM DIET_PLAN WHERE DietPlan_id = 1;
+INSERT INTO MEMBERSHIP (Membership_type, Start_date, End_date, Payment_type, Payment_amount, Status,
+                        Member_id, DietPlan_id, Trainer_id, Plan_id)
+    VALUES ('Monthly', '2024-05-01', '2024-05-31', 'Card', 1500.0, 'Active', 4, 2, 2, 3);
+INSERT INTO MEMBER_VITALS (WEIGHT, HEIGHT, RECORD_DATE, MEMB_ID) VALUES (94.0, 185.0, '2024-03-06', 4);
+'''
+
+# table: column whose zero value means the row no longer counts anything;
+# triggers leave such rows behind where a rebuild never creates them
+STATS_TABLES = {
+    'STATS_COUNTS': None,
+    'STATS_MEMBERSHIP_STATUS': 'memberships',
+    'STATS_REVENUE': 'memberships',
+    'STATS_TRAINER_MEMBER': 'memberships',
+    'STATS_TRAINER': 'members',
+    'STATS_PLAN_USAGE': 'memberships',
+}
+
+
+def run(conn, script):
+    for statement in script.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    conn.commit()
+
+
+def rounded(row):
+    return tuple(round(v, 6) if isinstance(v, float) else v for v in row)
+
+
+def stats_tables(conn):
+    tables = {}
+    for table, counter in STATS_TABLES.items():
+        where = f' WHERE {counter} != 0' if counter else ''
+        tables[table] = sorted(rounded(r) for r in conn.execute(f'SELECT * FROM {table}{where}'))
+    return tables
+
+
+def rollups(conn):
+    return sorted(rounded(r) for r in conn.execute('SELECT * FROM VITALS_ROLLUP'))
+
+
+def test_stats_triggers_match_rebuild(conn):
+    run(conn, SEED)
+    run(conn, WORKLOAD)
+    # The cascades and SET NULL actions really ran
+    assert conn.execute('SELECT COUNT(*) FROM MEMBERSHIP WHERE Member_id = 2').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM MEMBERSHIP WHERE Trainer_id = 1').fetchone()[0] == 0
+
+    maintained = stats_tables(conn)
+    stats.rebuild_stats(conn)
+    conn.commit()
+    assert maintained == stats_tables(conn)
+
+
+def test_rollup_triggers_match_rebuild(conn):
+    run(conn, SEED)
+    run(conn, WORKLOAD)
+    assert conn.execute('SELECT COUNT(*) FROM VITALS_ROLLUP WHERE MEMB_ID = 2').fetchone()[0] == 0
+
+    maintained = rollups(conn)
+    analytics.rebuild_rollups(conn)
+    conn.commit()
+    assert maintained == rollups(conn)
+
+
+def test_search_indexes_follow_writes(conn):
+    run(conn, SEED)
+    run(conn, WORKLOAD)
+    for fts, _, _, _, _ in search.INDEXES.values():
+        # Raises if the index disagrees with its external content table
+        conn.execute(f"INSERT INTO {fts} ({fts}, rank) VALUES ('integrity-check', 1)")
+
+    def found(text, kind):
+        return [r['id'] for r in search.search(conn.cursor(), text, [kind])]
+
+    assert found('Chen Li', 'members') == [3]
+    assert found('Wang', 'members') == []
+    assert found('Ben', 'members') == []
+    assert found('Maya', 'trainers') == []
+    assert found('hill sprints', 'workouts') == []
+    assert found('Mobility', 'workouts') == [3]
+    assert found('Keto', 'diets') == []
+    assert found('plant', 'diets') == [2]
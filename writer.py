@@ -0,0 +1,107 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class WriteCoordinator:
+    """Single writer thread that group-commits queued write operations.
+
+    Callers submit op(cursor) functions and block for the result. The
+    writer drains everything that arrives within a short window after the
+    first queued op and runs the batch in one transaction, so concurrent
+    requests share one commit instead of contending for SQLite's write
+    lock. Each op runs under its own savepoint: a failing op is rolled
+    back and gets its exception, the rest of the batch still commits.
+    """
+
+    def __init__(self, connect, window=0.002, max_batch=256):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        # Connect up front so configuration errors surface to the caller
+        self._conn = connect()
+        self._conn.isolation_level = None   # transactions are managed explicitly below
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        future = Future()
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError('The SQLite writer thread has stopped')
+            self._queue.put((op, future))
+        return future.result()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self._conn
+        try:
+            while True:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch = [first]
+                stop = False
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stop:
+                    break
+        finally:
+            # Fail whatever is still queued so no caller waits forever
+            with self._lock:
+                self._stopped = True
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    item[1].set_exception(RuntimeError('The SQLite writer thread has stopped'))
+            conn.close()
+
+    def _commit(self, conn, batch):
+        done = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for op, future in batch:
+                conn.execute('SAVEPOINT op')
+                try:
+                    result = op(conn.cursor())
+                except Exception as e:
+                    future.set_exception(e)
+                    conn.execute('ROLLBACK TO op')
+                    conn.execute('RELEASE op')
+                else:
+                    conn.execute('RELEASE op')
+                    done.append((future, result))
+            conn.execute('COMMIT')
+        except Exception as e:
+            # The transaction failed as a whole (lock timeout, I/O error, or
+            # SQLite rolled it back itself), so none of the batch committed
+            if conn.in_transaction:
+                try:
+                    conn.execute('ROLLBACK')
+                except Exception:
+                    pass
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in done:
+            future.set_result(result)